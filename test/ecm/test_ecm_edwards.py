@@ -0,0 +1,100 @@
+import random
+import unittest
+import wheel_sieve.ecm.ecm_montgomery as mnt
+from wheel_sieve.ecm.ecm_edwards import (
+    add_pt,
+    dbl_pt,
+    ecm,
+    get_curve_random,
+    get_sigma,
+    mul_pt,
+    naf,
+    stage1,
+    to_montgomery,
+)
+
+
+def on_curve(pt, curve):
+    x, y, z, t = pt
+    d, _k, n = curve
+    return (-x * x + y * y) * z * z % n == (
+        z ** 4 + d * x * x * y * y
+    ) % n and x * y % n == z * t % n
+
+
+def same_pt(pt1, pt2, n):
+    x1, y1, z1, _t1 = pt1
+    x2, y2, z2, _t2 = pt2
+    return x1 * z2 % n == x2 * z1 % n and y1 * z2 % n == y2 * z1 % n
+
+
+class TestECMEdwards(unittest.TestCase):
+    n = 406724252548875212358759885439 * 724413085648406196306771670711
+
+    def test_get_sigma(self):
+        n = self.n
+        for k in range(1, 10):
+            sigma, w = get_sigma(k, n)
+            self.assertEqual(
+                w * w % n, (sigma - 5) * (sigma + 1) * (3 * sigma - 5) * (sigma + 3) % n
+            )
+        # G itself gives sigma = 11.
+        self.assertEqual(get_sigma(1, n)[0], 11)
+
+    def test_curve(self):
+        random.seed(2)
+        for _ in range(5):
+            pt, curve = get_curve_random(self.n)
+            self.assertTrue(on_curve(pt, curve))
+            self.assertTrue(on_curve(dbl_pt(pt, curve), curve))
+            self.assertTrue(same_pt(dbl_pt(pt, curve), add_pt(pt, pt, curve), self.n))
+
+    def test_naf(self):
+        random.seed(2)
+        for width in (2, 3, 6):
+            for k in list(range(200)) + [random.getrandbits(300) for _ in range(20)]:
+                digits = naf(k, width)
+                self.assertEqual(sum(d << i for i, d in enumerate(digits)), k)
+                for i, d in enumerate(digits):
+                    if d != 0:
+                        self.assertEqual(d % 2, 1)
+                        self.assertLess(abs(d), 1 << (width - 1))
+                        self.assertFalse(any(digits[i + 1 : i + width]))
+
+    def test_mul_pt(self):
+        random.seed(2)
+        pt, curve = get_curve_random(self.n)
+        res = (0, 1, 1, 0)
+        for k in range(100):
+            self.assertTrue(same_pt(mul_pt(pt, curve, k), res, self.n))
+            res = add_pt(res, pt, curve)
+
+    def test_stage1(self):
+        random.seed(2)
+        n = self.n
+        b1 = 200
+        pt, curve = get_curve_random(n)
+        pt_res = stage1(pt, curve, b1)
+        for k in mnt.stage1_schedule(b1):
+            pt = mul_pt(pt, curve, k)
+        self.assertTrue(same_pt(pt, pt_res, n))
+
+    def test_to_montgomery(self):
+        random.seed(2)
+        n = self.n
+        pt, curve = get_curve_random(n)
+        mnt_pt, mnt_curve = to_montgomery(pt, curve)
+        for k in (2, 3, 7, 100):
+            x1, z1 = to_montgomery(mul_pt(pt, curve, k), curve)[0]
+            x2, z2 = mnt.mul_pt_exn(mnt_pt, mnt_curve, k)
+            self.assertEqual(x1 * z2 % n, x2 * z1 % n)
+
+    def test_ecm(self):
+        random.seed(2)
+        n = 1000000007 * 1000000009
+        res = ecm(n, 20, 2000, 50000, output=False)
+        self.assertIn(res, (1000000007, 1000000009))
+
+
+if __name__ == "__main__":
+    unittest.main()
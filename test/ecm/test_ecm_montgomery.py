@@ -5,6 +5,10 @@ from wheel_sieve.ecm.ecm_montgomery import (
     add_pt,
     dbl_pt,
     mul_pt_exn,
+    mul_pt_prac,
+    prac_chain,
+    stage1,
+    stage1_schedule,
 )
 
 
@@ -27,6 +31,33 @@ class TestECMMontgomery(unittest.TestCase):
             pt_3x_b = mul_pt_exn(pt, curve, 3)
             self.assertEqual(pt_3x_a, pt_3x_b)
 
+    def test_stage1_schedule(self):
+        self.assertEqual(stage1_schedule(20), [16, 9, 5, 7, 11, 13, 17, 19])
+        self.assertEqual(stage1_schedule(8), [8, 3, 5, 7])
+
+    def test_stage1(self):
+        n = 406724252548875212358759885439 * 724413085648406196306771670711
+        b1 = 200
+        for sigma in range(10, 15):
+            pt, curve = get_curve_suyama(sigma, n)
+            pt_res = stage1(pt, curve, b1)
+            for k in stage1_schedule(b1):
+                pt = mul_pt_exn(pt, curve, k)
+            # Same point, in other projective coordinates
+            self.assertEqual(pt[0] * pt_res[1] % n, pt_res[0] * pt[1] % n)
+
+    def test_prac_chain(self):
+        self.assertIsNone(prac_chain(2))
+        self.assertEqual(prac_chain(5), (3,))
+        self.assertEqual(prac_chain(4), (13,))
+        self.assertIsNotNone(prac_chain(1009))
+        n = 406724252548875212358759885439 * 724413085648406196306771670711
+        pt, curve = get_curve_suyama(10, n)
+        for k in list(range(1, 200)) + [1009, 65537, 999983, 2 ** 20]:
+            pt_a = mul_pt_prac(pt, curve, k)
+            pt_b = mul_pt_exn(pt, curve, k)
+            self.assertEqual(pt_a[0] * pt_b[1] % n, pt_b[0] * pt_a[1] % n)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,61 @@
+import multiprocessing
+import random
+import unittest
+from wheel_sieve.ecm.ecm_parallel import ecm
+from wheel_sieve.ecm import ecm_montgomery, ecm_parallel
+
+
+class TestECMParallel(unittest.TestCase):
+    def test_ecm(self):
+        n = 1000000007 * 998244353
+        for workers in (1, 2):
+            factor = ecm(
+                n, 8, 2_000, 50_000, workers=workers, seed=2, wheel=210, output=False
+            )
+            self.assertIn(factor, (1000000007, 998244353))
+
+    def test_ecm_seed(self):
+        n = 1000000007 * 998244353 * 1000000000039
+        factor_list = [
+            ecm(n, 8, 2_000, 50_000, workers=1, seed=5, wheel=210, output=False)
+            for _ in range(2)
+        ]
+        self.assertEqual(factor_list[0], factor_list[1])
+
+    def test_ecm_random_state(self):
+        n = 1000000007 * 998244353
+        random.seed(3)
+        state = random.getstate()
+        ecm(n, 4, 2_000, 50_000, workers=1, seed=5, wheel=210, output=False)
+        self.assertEqual(random.getstate(), state)
+
+    def test_ecm_stop(self):
+        n = 1000000007 * 998244353
+        stop = multiprocessing.Event()
+        ecm_parallel._init_task(stop)
+        try:
+            task = (ecm_montgomery.ecm, n, 4, 5_000, 100_000, 2, dict())
+            self.assertIn(ecm_parallel._ecm_task(*task), (1000000007, 998244353))
+            # Tasks left running once a factor is found return before their next curve.
+            stop.set()
+            self.assertIsNone(ecm_parallel._ecm_task(*task))
+        finally:
+            ecm_parallel._init_task(None)
+
+    def test_ecm_backend(self):
+        n = 1000000007 * 998244353
+        factor = ecm(
+            n, 4, 5_000, 100_000, workers=2, seed=2, backend=ecm_montgomery.ecm
+        )
+        self.assertIn(factor, (1000000007, 998244353))
+
+    def test_ecm_not_found(self):
+        self.assertIsNone(
+            ecm(
+                1000000007, 2, 2_000, 50_000, workers=2, seed=2, wheel=210, output=False
+            )
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
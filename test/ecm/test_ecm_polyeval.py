@@ -5,6 +5,9 @@ from wheel_sieve.ecm.ecm_polyeval import (
     product_tree,
     recip_tree,
     remainder_tree,
+    scaled_remainder_tree,
+    stage2_plan,
+    tree_layout,
 )
 
 
@@ -136,5 +139,72 @@ class TestRemainderTree(unittest.TestCase):
         self.assertEqual(target, r_tree[0])
 
 
+class TestScaledRemainderTree(unittest.TestCase):
+    def check(self, s_list, t_list, n):
+        target = remainder_loop(s_list, t_list, n)
+        Fx = product_tree([Polynomial([n - i, 1], n) for i in t_list], n)[0]
+        g_tree = product_tree([Polynomial([n - i, 1], n) for i in s_list], n)
+        g_recip_tree = recip_tree(g_tree)
+        r_tree = scaled_remainder_tree(Fx, g_tree, g_recip_tree[0], n)
+        self.assertEqual(target, r_tree[0])
+        self.assertEqual(remainder_tree(Fx, g_tree, g_recip_tree, n), r_tree)
+
+    def test1(self):
+        random.seed(2)
+        n = 257
+        s_list = [random.randint(1, n - 1) for _ in range(256)]
+        t_list = [random.randint(1, n - 1) for _ in range(256)]
+        self.check(s_list, t_list, n)
+
+    def test2(self):
+        random.seed(2)
+        n = 310739457793333465418548557523014289
+        s_list = [random.randint(1, n - 1) for _ in range(5)]
+        t_list = [random.randint(1, n - 1) for _ in range(501)]
+        self.check(s_list, t_list, n)
+
+    def test3(self):
+        random.seed(2)
+        n = 310739457793333465418548557523014289
+        s_list = [random.randint(1, n - 1) for _ in range(501)]
+        t_list = [random.randint(1, n - 1) for _ in range(3)]
+        self.check(s_list, t_list, n)
+
+    def test4(self):
+        n = 257
+        self.check([2, 3], [4], n)
+        self.check([2, 3, 4], [4], n)
+
+
+class TestStage2Plan(unittest.TestCase):
+    def test_stage2_plan(self):
+        plan = stage2_plan(1000, 10030, 30)
+        self.assertIs(plan, stage2_plan(1000, 10030, 30))
+        self.assertEqual(plan.j_list, [1, 7, 11, 13])
+        self.assertEqual(len(plan.k_ls), len(plan.j_list) + 7)
+        self.assertEqual(plan.k_ls[1], 7 ** 6 + 6 * 7 ** 4 + 9 * 7 ** 2 + 2)
+        self.assertEqual(plan.blocks, [2] * 151 + [1])
+        self.assertIs(plan.f_layout, tree_layout(4))
+        self.assertEqual(sorted(plan.block_layouts), [1, 2])
+
+
+class TestTreeLayout(unittest.TestCase):
+    def test_tree_layout(self):
+        layout = tree_layout(5)
+        self.assertIs(layout, tree_layout(5))
+        self.assertEqual(layout.size, 15)
+        self.assertEqual(layout.leaf_start, 7)
+        self.assertEqual(
+            [list(level) for level in layout.levels], [[3, 4, 5, 6], [1, 2], [0]]
+        )
+        self.assertEqual(tree_layout(1).levels, [])
+        n = 257
+        f_list = [Polynomial([i, 1], n) for i in range(5)]
+        p_tree = product_tree(f_list, n)
+        self.assertEqual(len(p_tree), layout.size)
+        self.assertEqual(p_tree[layout.leaf_start : layout.leaf_start + 5], f_list)
+        self.assertEqual(p_tree[0], product_loop(f_list))
+
+
 if __name__ == "__main__":
     unittest.main()
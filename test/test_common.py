@@ -1,5 +1,18 @@
 import unittest
-from wheel_sieve.common import inv, inv_multi, inv_power, gcd, InverseNotFound
+import numpy as np
+import wheel_sieve.common as common
+from wheel_sieve.common import (
+    inv,
+    inv_multi,
+    inv_power,
+    init_wheel,
+    iter_wheel,
+    wheel_plan,
+    WheelPlan,
+    gcd,
+    InverseNotFound,
+)
+from wheel_sieve.wheel_sieve_byte import wheel_sieve
 
 
 class TestECMCommon(unittest.TestCase):
@@ -20,6 +33,80 @@ class TestECMCommon(unittest.TestCase):
         self.assertEqual(gcd(cm_target.exception.x, n), 65537)
         self.assertEqual(gcd(cm_actual.exception.x, n), 65537)
 
+    def test_init_wheel(self):
+        for b1, b2, wheel in [(11, 1_000, 30), (1_000, 100_000, 2310)]:
+            j_list, prime_array = init_wheel(b1, b2, wheel)
+            self.assertEqual(
+                j_list, [j for j in range(1, wheel // 2) if gcd(j, wheel) == 1]
+            )
+            c1 = b1 // wheel
+            target = set()
+            for p in wheel_sieve(b1, b2):
+                c, j = divmod(p, wheel)
+                if j > wheel // 2:
+                    c, j = c + 1, wheel - j
+                target.add((c - c1, j_list.index(j)))
+            bits = np.unpackbits(prime_array, axis=1, bitorder="little")
+            self.assertEqual(set(zip(*np.nonzero(bits))), target)
+
+    def test_iter_wheel(self):
+        for b1, b2, wheel in [
+            (11, 10_000, 30),
+            (1_000, 100_000, 2310),
+            (13, 5_000, 60),
+        ]:
+            _j_list, prime_array = init_wheel(b1, b2, wheel)
+            c_list = []
+            for c, prime_rows in iter_wheel(b1, b2, wheel, rows=3):
+                c_list.append(c)
+                self.assertLessEqual(len(prime_rows), 3)
+                self.assertEqual(
+                    prime_rows.tolist(), prime_array[c : c + len(prime_rows)].tolist()
+                )
+            self.assertEqual(c_list, list(range(0, len(prime_array), 3)))
+
+    def test_wheel_plan(self):
+        for b1, b2, wheel in [
+            (11, 10_000, 30),
+            (1_000, 100_000, 2310),
+            (13, 5_000, 60),
+        ]:
+            j_list, prime_array = init_wheel(b1, b2, wheel)
+            plan = WheelPlan(b1, b2, wheel)
+            self.assertEqual(plan.j_list, j_list)
+            self.assertEqual(plan.pair_array.shape, prime_array.shape)
+            self.assertLess(
+                np.unpackbits(plan.pair_array).sum(), np.unpackbits(prime_array).sum()
+            )
+            bits = np.unpackbits(plan.pair_array, axis=1, bitorder="little")
+            c, j_idx = np.nonzero(bits[:, : len(j_list)])
+            c = c + b1 // wheel
+            j = np.array(j_list)[j_idx]
+            numbers = np.concatenate((c * wheel + j, c * wheel - j))
+            for p in wheel_sieve(b1, b2):
+                if wheel % p != 0:
+                    self.assertTrue(np.any(numbers % p == 0))
+            self.assertEqual(
+                [(c, np.nonzero(row)[0].tolist()) for c, row in enumerate(bits)],
+                list(plan),
+            )
+            self.assertIs(wheel_plan(b1, b2, wheel), wheel_plan(b1, b2, wheel))
+
+    def test_wheel_plan_stream(self):
+        plan_rows = common.PLAN_ROWS
+        try:
+            common.PLAN_ROWS = 10
+            plan = WheelPlan(1_000, 1_000_000, 2310)
+        finally:
+            common.PLAN_ROWS = plan_rows
+        self.assertIsNone(plan.pair_array)
+        _j_list, prime_array = init_wheel(1_000, 1_000_000, 2310)
+        bits = np.unpackbits(prime_array, axis=1, bitorder="little")
+        self.assertEqual(
+            [(c, np.nonzero(row)[0].tolist()) for c, row in enumerate(bits)],
+            list(plan),
+        )
+
     def test_inv_power(self):
         self.assertIsNone(inv_power(63, 3))
         self.assertEqual(inv_power(64, 3), 4)
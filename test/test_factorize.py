@@ -15,6 +15,14 @@ class TestFactorize(unittest.TestCase):
             num *= f ** d
         self.assertEqual(num, 2 ** 64 - 1)
 
+    def test_factorize_workers(self):
+        n = 1000000007 * 998244353 * 1000000000039 ** 2
+        prime_dict, factor_dict = factorize(n, workers=2)
+        self.assertDictEqual(
+            prime_dict, {1000000007: 1, 998244353: 1, 1000000000039: 2}
+        )
+        self.assertDictEqual(factor_dict, {})
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,27 @@
+import random
+import unittest
+from wheel_sieve.ntt import multiply
+
+
+class TestNTT(unittest.TestCase):
+    def test_multiply_small(self):
+        for x in (0, 1, 5, 65535, 65536, 1 << 100):
+            for y in (0, 1, 7, 65537, (1 << 64) - 1):
+                self.assertEqual(multiply(x, y), x * y)
+
+    def test_multiply(self):
+        random.seed(2)
+        for _ in range(50):
+            x = random.getrandbits(random.randint(1, 20000))
+            y = random.getrandbits(random.randint(1, 20000))
+            self.assertEqual(multiply(x, y), x * y)
+            self.assertEqual(multiply(x, x), x * x)
+
+    def test_multiply_carry(self):
+        # Limbs of all ones give the largest sums of limb products.
+        x = (1 << 200000) - 1
+        self.assertEqual(multiply(x, x), x * x)
+
+
+if __name__ == "__main__":
+    unittest.main()
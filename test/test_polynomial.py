@@ -1,5 +1,6 @@
 import random
 import unittest
+from unittest import mock
 from wheel_sieve.polynomial import Polynomial, inv
 
 
@@ -93,6 +94,45 @@ class TestPolynomialMethods(unittest.TestCase):
         c = mul(a, b, n)
         self.assertEqual(Polynomial(a, n) * Polynomial(b, n), Polynomial(c, n))
 
+    def test_mul_ntt(self):
+        random.seed(2)
+        n = 310739457793333465418548557523014289
+        a = [random.randint(0, n - 1) for _ in range(100)]
+        b = [random.randint(0, n - 1) for _ in range(300)]
+        c = mul(a, b, n)
+        with mock.patch("wheel_sieve.polynomial.NTT_BITS", 0):
+            self.assertEqual(Polynomial(a, n) * Polynomial(b, n), Polynomial(c, n))
+            self.assertEqual(
+                Polynomial(a, n) * Polynomial(a, n), Polynomial(mul(a, a, n), n)
+            )
+
+    def test_mul_unreduced(self):
+        random.seed(2)
+        n = 310739457793333465418548557523014289
+        a = [random.randint(0, n - 1) for _ in range(100)]
+        b = [random.randint(0, n - 1) for _ in range(300)]
+        c = mul(a, b, n)
+        prod = Polynomial(a, n) * Polynomial(b, n)
+        self.assertEqual(len(prod), 399)
+        self.assertEqual(prod[150:], Polynomial(c[150:], n))
+        self.assertEqual(prod[150:][10:20], Polynomial(c[160:170], n))
+        self.assertEqual(
+            prod[150:] * Polynomial(a, n), Polynomial(mul(c[150:], a, n), n)
+        )
+        self.assertEqual(prod, Polynomial(c, n))
+        self.assertEqual((Polynomial([0], n) * Polynomial(b, n)).coeff, [0] * 300)
+
+    def test_middle_product(self):
+        random.seed(2)
+        n = 310739457793333465418548557523014289
+        a = [random.randint(0, n - 1) for _ in range(300)]
+        b = [random.randint(0, n - 1) for _ in range(100)]
+        c = mul(a, b, n)
+        res = Polynomial(a, n).middle_product(Polynomial(b, n))
+        self.assertEqual(res.coeff, c[99:300])
+        res = Polynomial(a[:99], n).middle_product(Polynomial(b, n))
+        self.assertEqual(res.coeff, [])
+
     def test_divmod(self):
         random.seed(2)
         n = 5
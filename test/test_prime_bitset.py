@@ -0,0 +1,46 @@
+import unittest
+import numpy as np
+from wheel_sieve.prime_bitset import PrimeBitset
+from wheel_sieve.wheel_sieve_byte import wheel_sieve_array
+
+
+class TestPrimeBitset(unittest.TestCase):
+    def test_primes(self):
+        for lbound, ubound, p_list in [
+            (1, 1_000, (2, 3, 5, 7, 11)),
+            (4, 5, (2, 3, 5)),
+            (30, 31, (2, 3, 5)),
+            (997, 123_457, (2, 3, 5)),
+            (1_000_000, 1_099_991, (2, 3, 5, 7)),
+        ]:
+            bitset = PrimeBitset(lbound, ubound, p_list, mem=1_000)
+            target = wheel_sieve_array(lbound, ubound).tolist()
+            self.assertEqual(bitset.primes().tolist(), target)
+            self.assertEqual(list(bitset), target)
+            self.assertEqual(len(bitset), len(target))
+
+    def test_is_prime(self):
+        bitset = PrimeBitset(100, 10_000)
+        numbers = np.arange(0, 10_100)
+        target = np.zeros(len(numbers), dtype=bool)
+        target[wheel_sieve_array(100, 10_000).astype(np.int64)] = True
+        self.assertEqual(bitset.is_prime(numbers).tolist(), target.tolist())
+        self.assertTrue(bitset.is_prime(9_973))
+        self.assertFalse(bitset.is_prime(9_971))
+        self.assertFalse(bitset.is_prime(97))
+
+    def test_rank_select(self):
+        bitset = PrimeBitset(2, 100_000)
+        primes = wheel_sieve_array(2, 100_000).tolist()
+        for i, prime in enumerate(primes):
+            self.assertEqual(bitset.select(i), prime)
+            self.assertEqual(bitset.rank(prime), i + 1)
+            self.assertEqual(bitset.rank(prime - 1), i)
+        self.assertEqual(bitset.rank(1), 0)
+        self.assertEqual(bitset.rank(10 ** 6), len(primes))
+        with self.assertRaises(IndexError):
+            bitset.select(len(primes))
+
+
+if __name__ == "__main__":
+    unittest.main()
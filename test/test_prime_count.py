@@ -0,0 +1,28 @@
+import unittest
+from unittest import mock
+from wheel_sieve.prime_count import prime_pi
+from wheel_sieve.wheel_sieve_byte import wheel_sieve_count
+
+
+class TestPrimeCount(unittest.TestCase):
+    def test_prime_pi_small(self):
+        self.assertEqual(prime_pi(0), 0)
+        self.assertEqual(prime_pi(2), 1)
+        self.assertEqual(prime_pi(100), 25)
+        with self.assertRaises(ValueError):
+            prime_pi(-1)
+
+    def test_prime_pi_sieve(self):
+        with mock.patch("wheel_sieve.prime_count.SIEVE_BOUND", 10_000):
+            for x in (10_000, 12_345, 99_991, 1_000_000, 2_718_281):
+                self.assertEqual(prime_pi(x), wheel_sieve_count(1, x + 1))
+                self.assertEqual(prime_pi(x, mem=1_000), wheel_sieve_count(1, x + 1))
+
+    def test_prime_pi_large(self):
+        self.assertEqual(prime_pi(20_000_003), wheel_sieve_count(1, 20_000_004))
+        self.assertEqual(prime_pi(10 ** 9), 50_847_534)
+        self.assertEqual(prime_pi(10 ** 10), 455_052_511)
+
+
+if __name__ == "__main__":
+    unittest.main()
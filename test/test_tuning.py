@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from wheel_sieve.tuning import calibrate, tuned_params
+from wheel_sieve.wheel_sieve_byte import wheel_sieve_count
+
+
+class TestTuning(unittest.TestCase):
+    def test_calibrate(self):
+        for sieve in ("byte", "bit"):
+            params = calibrate(
+                sieve,
+                lbound=1_000_000,
+                mem_list=(1_000, 10_000),
+                p_list_list=((2, 3), (2, 3, 5)),
+            )
+            self.assertIn(params["mem"], (1_000, 10_000))
+            self.assertIn(params["p_list"], ((2, 3), (2, 3, 5)))
+        with self.assertRaises(ValueError):
+            calibrate("word")
+
+    def test_tuned_params(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tuning", "tuning.json")
+            with mock.patch(
+                "wheel_sieve.tuning.calibrate",
+                return_value={"mem": 10_000, "p_list": (2, 3, 5, 7)},
+            ) as calibrate_mock:
+                params = tuned_params(path=path)
+                self.assertEqual(params, {"mem": 10_000, "p_list": (2, 3, 5, 7)})
+                self.assertEqual(tuned_params(path=path), params)
+                self.assertEqual(calibrate_mock.call_count, 1)
+                tuned_params(path=path, recalibrate=True)
+                self.assertEqual(calibrate_mock.call_count, 2)
+            self.assertEqual(wheel_sieve_count(1, 100_000, **params), 9_592)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,7 @@
 import unittest
-from wheel_sieve.wheel_sieve_bit import wheel_sieve_count
+import numpy as np
+from wheel_sieve.wheel_sieve_bit import wheel_sieve_count, popcount
+import wheel_sieve.wheel_sieve_byte as byte
 
 
 class TestWheelSieveBit(unittest.TestCase):
@@ -7,6 +9,23 @@ class TestWheelSieveBit(unittest.TestCase):
         self.assertEqual(wheel_sieve_count(1, 101), 25)
         self.assertEqual(wheel_sieve_count(1, 102), 26)
 
+    def test_wheel_sieve_count_range(self):
+        for lbound, ubound in [(59, 67), (997, 123_457), (1_000_000, 1_005_767)]:
+            self.assertEqual(
+                wheel_sieve_count(lbound, ubound),
+                byte.wheel_sieve_count(lbound, ubound),
+            )
+
+    def test_wheel_sieve_count_mem(self):
+        for mem in (1, 100, 10_000):
+            self.assertEqual(wheel_sieve_count(1, 1_000_000, mem=mem), 78_498)
+        with self.assertRaises(ValueError):
+            wheel_sieve_count(1, 100, mem=0)
+
+    def test_popcount(self):
+        words = np.array([0, 1, 2 ** 64 - 1, 0x8000000000000001], dtype=np.uint64)
+        self.assertEqual(popcount(words), 67)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,5 +1,18 @@
+import os
+import tempfile
 import unittest
-from wheel_sieve.wheel_sieve_byte import wheel_sieve, wheel_sieve_count
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import numpy as np
+from wheel_sieve import wheel_sieve_byte
+from wheel_sieve.wheel_sieve_byte import (
+    SegmentedSieve,
+    Worker,
+    wheel_table,
+    wheel_sieve,
+    wheel_sieve_array,
+    wheel_sieve_count,
+)
 
 
 class TestWheelSieveByte(unittest.TestCase):
@@ -11,6 +24,154 @@ class TestWheelSieveByte(unittest.TestCase):
         self.assertEqual(wheel_sieve_count(1, 101), 25)
         self.assertEqual(wheel_sieve_count(1, 102), 26)
 
+    def test_wheel_sieve_array(self):
+        primes = wheel_sieve_array(1, 32)
+        self.assertEqual(primes.dtype, np.uint64)
+        self.assertEqual(primes.tolist(), [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31])
+        self.assertEqual(wheel_sieve_array(1, 2).tolist(), [])
+        self.assertEqual(
+            wheel_sieve_array(1_000, 100_000).tolist(),
+            list(wheel_sieve(1_000, 100_000)),
+        )
+
+    def test_wheel_table(self):
+        table = wheel_table([2, 3, 5])
+        self.assertIs(table, wheel_table((2, 3, 5)))
+        self.assertEqual(table.wheel, 30)
+        self.assertEqual(table.k_list, [1, 7, 11, 13, 17, 19, 23, 29])
+        self.assertEqual(table.k_index[[1, 7, 29, 2, 25]].tolist(), [0, 1, 7, -1, -1])
+        # Large wheels are sieved without tables quadratic in len(k_list).
+        self.assertEqual(wheel_sieve_count(1, 10 ** 6, (2, 3, 5, 7, 11, 13)), 78_498)
+
+    def test_segmented_sieve(self):
+        sieve = SegmentedSieve(1_000, 100_000, wheel_table((2, 3, 5)))
+        count = sum(
+            int(sieve.sieve(curr).sum())
+            for curr in (1_001, 7_777, 7_800, 50_005, 100_000)
+        )
+        self.assertEqual(count, wheel_sieve_count(1_000, 100_000))
+
+    def test_bucket_sieve(self):
+        table = wheel_table((2, 3, 5))
+        for bucket_rows in (None, 1, 100, 1_000):
+            sieve = SegmentedSieve(1_000, 1_000_000, table, bucket_rows)
+            count = sum(
+                int(sieve.sieve(curr).sum())
+                for curr in (1_001, 7_777, 7_800, 50_005, 500_000, 1_000_000)
+            )
+            self.assertEqual(count, 78_330)
+        self.assertEqual(
+            wheel_sieve_count(10 ** 13, 10 ** 13 + 1_000),
+            len(list(wheel_sieve(10 ** 13, 10 ** 13 + 1_000))),
+        )
+
+    def test_presieve(self):
+        # Presieve primes are kept, whatever the wheel.
+        for p_list in ((2, 3), (2, 3, 5), (2, 3, 5, 7)):
+            self.assertEqual(
+                list(wheel_sieve(1, 40, p_list)),
+                [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37],
+            )
+            self.assertEqual(wheel_sieve_count(17, 18, p_list), 1)
+        # Segments start at any phase of the pattern.
+        self.assertEqual(wheel_sieve_count(1_000_003, 1_510_511), 36_431)
+
+    def test_worker(self):
+        worker = Worker()
+        primes = worker.primes_below(100)
+        self.assertEqual(primes.dtype, np.uint32)
+        self.assertEqual(len(primes), 25)
+        self.assertEqual(list(worker(32)), [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31])
+        self.assertEqual(worker.prime_pi(1), 0)
+        self.assertEqual(worker.prime_pi(7), 4)
+        self.assertEqual(worker.prime_pi(1_000_000), 78_498)
+        self.assertEqual(primes.tolist(), worker.primes_below(100).tolist())
+        self.assertEqual(worker.primes.tolist(), worker.primes_below(1_000_001).tolist())
+
+    def test_worker_threads(self):
+        worker = Worker()
+        bounds = [10 ** 5, 10 ** 3, 10 ** 6, 10 ** 4] * 4
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            counts = list(executor.map(worker.prime_pi, bounds))
+        self.assertEqual(counts, [9_592, 168, 78_498, 1_229] * 4)
+
+    def test_worker_uint64(self):
+        worker = Worker()
+        small = worker.primes_below(70_000)
+        self.assertEqual(worker.primes.dtype, np.uint32)
+        # Skip ahead to just below 2 ** 32, so that gen sieves the primes around it.
+        worker.lim = 2 ** 32 - 100
+        primes = worker.primes_below(2 ** 32 + 100)
+        self.assertEqual(primes.dtype, np.uint64)
+        self.assertEqual(
+            primes[len(small) :].tolist(),
+            wheel_sieve_array(2 ** 32 - 100, 2 ** 32 + 100).tolist(),
+        )
+        self.assertEqual(worker.primes_below(10).tolist(), [2, 3, 5, 7])
+        self.assertEqual(worker.primes.tolist(), primes.tolist())
+
+    def test_worker_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "primes", "primes.bin")
+            self.assertEqual(Worker(path=path).prime_pi(1_000_000), 78_498)
+            worker = Worker(path=path)
+            self.assertEqual(worker.prime_pi(100_000), 9_592)
+            self.assertIsInstance(worker._buffer, np.memmap)
+            # Extend the file beyond the memory-mapped primes.
+            self.assertEqual(worker.prime_pi(2_000_000), 148_933)
+            worker = Worker(path=path)
+            self.assertTrue(worker.load(path))
+            self.assertGreaterEqual(worker.lim, 2_000_000)
+            # Damaged files are ignored.
+            with open(path, "r+b") as f:
+                f.truncate(100)
+            worker = Worker(path=path)
+            self.assertFalse(worker.load(path))
+            self.assertEqual(worker.prime_pi(100_000), 9_592)
+
+    def test_worker_file_saves(self):
+        saves = []
+
+        class CountingWorker(Worker):
+            def save(self, path):
+                saves.append(self.lim)
+                super(CountingWorker, self).save(path)
+
+        with tempfile.TemporaryDirectory() as directory:
+            worker = CountingWorker(path=os.path.join(directory, "primes.bin"))
+            # As PRIME_GEN, gen calls back into the worker for the sieving primes.
+            with mock.patch.object(wheel_sieve_byte, "PRIME_GEN", worker):
+                self.assertEqual(worker.prime_pi(10_000_000), 664_579)
+            self.assertEqual(saves, [worker.lim])
+
+    def test_wheel_sieve_mem(self):
+        for mem in (1, 100, 10_000):
+            self.assertEqual(wheel_sieve_count(1, 100_000, mem=mem), 9_592)
+            self.assertEqual(
+                list(wheel_sieve(1, 10_000, mem=mem)), list(wheel_sieve(1, 10_000))
+            )
+        with self.assertRaises(ValueError):
+            wheel_sieve_count(1, 100, mem=0)
+
+    def test_empty_segment(self):
+        # Single numbers on a multiple of the wheel sieve a segment with no rows.
+        self.assertEqual(wheel_sieve_count(30, 31), 0)
+        self.assertEqual(wheel_sieve_count(24, 25, (2, 3)), 0)
+        self.assertEqual(wheel_sieve_count(31, 32), 1)
+        self.assertEqual(wheel_sieve_array(30, 31).tolist(), [])
+        # Ranges ending on a segment boundary.
+        self.assertEqual(wheel_sieve_count(1, 61, mem=8), 17)
+        self.assertEqual(wheel_sieve_count(1, 91, mem=8, workers=2), 24)
+        self.assertEqual(list(wheel_sieve(1, 61, mem=8)), list(wheel_sieve(1, 61)))
+
+    def test_wheel_sieve_parallel(self):
+        self.assertEqual(
+            list(wheel_sieve(1, 100_000, workers=2)), list(wheel_sieve(1, 100_000))
+        )
+        self.assertEqual(
+            wheel_sieve_count(1, 100_000, workers=2), wheel_sieve_count(1, 100_000)
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
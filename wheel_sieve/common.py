@@ -2,7 +2,18 @@
 """
 from math import gcd
 import numpy as np
-from wheel_sieve.wheel_sieve_byte import PRIME_GEN, wheel_sieve
+from wheel_sieve.prime_bitset import PrimeBitset
+from wheel_sieve.wheel_sieve_byte import PRIME_GEN, wheel_sieve_array, wheel_table
+
+# Rows of prime_array built at a time by init_wheel and iter_wheel
+WHEEL_ROWS = 1 << 15
+
+# Stage 2 plans of at most PLAN_ROWS rows of c are paired and kept in memory. Longer ranges
+# are streamed with iter_wheel.
+PLAN_ROWS = 1 << 16
+
+# init_wheel sieves on the wheel of the prime factors of wheel up to BITSET_PRIME_MAX.
+BITSET_PRIME_MAX = 7
 
 
 class InverseNotFound(Exception):
@@ -75,21 +86,184 @@ def init_wheel(b1, b2, wheel):
         tuple(list(int), np.array): (j_list, prime_array).
     """
     j_list = [j for j in range(1, wheel // 2) if gcd(j, wheel) == 1]
-    j_index = {j: i for i, j in enumerate(j_list)}
     c1 = b1 // wheel
     c2 = b2 // wheel + 2
-    prime_array = np.zeros((c2 - c1, (len(j_list) - 1) // 8 + 1), dtype=np.uint8)
-    for p in wheel_sieve(b1, b2):
-        c = p // wheel
-        j = p % wheel
-        if j > wheel // 2:
-            c += 1
-            j = wheel - j
-        jq, jr = divmod(j_index[j], 8)
-        prime_array[c - c1, jq] |= 1 << jr
+    prime_array = np.zeros((c2 - c1, (len(j_list) + 7) // 8), dtype=np.uint8)
+    for c, prime_rows in iter_wheel(b1, b2, wheel):
+        prime_array[c : c + len(prime_rows)] = prime_rows
     return j_list, prime_array
 
 
+def iter_wheel(b1, b2, wheel, rows=None):
+    """Stream prime_array of init_wheel in windows of rows, so that memory is bounded
+    regardless of b2.
+
+    Args:
+        b1 (int): Lower bound of prime range.
+        b2 (int): Upper bound of prime range.
+        wheel (int): Wheel. Typically primorial numbers like 30, 210, 2310.
+        rows (int, optional): Rows per window. Defaults to None, using WHEEL_ROWS.
+
+    Yields:
+        tuple(int, np.array): (c - c1, prime_rows), where prime_rows are rows c - c1,
+            c - c1 + 1, ... of prime_array, in ascending order.
+    """
+    if rows is None:
+        rows = WHEEL_ROWS
+    j_list = [j for j in range(1, wheel // 2) if gcd(j, wheel) == 1]
+    c1 = b1 // wheel
+    c2 = b2 // wheel + 2
+    # Built from a PrimeBitset on a smaller wheel w0 dividing wheel, which sieves faster, so
+    # row c of wheel spans rows c * wheel // w0 to (c + 1) * wheel // w0 - 1 of the bitset.
+    # Numbers c * wheel + j are in row c of wheel, and c * wheel - j = (c - 1) * wheel +
+    # (wheel - j) in row c - 1.
+    p_list = tuple(p for p in PRIME_GEN(wheel + 1) if wheel % p == 0)
+    p_list = tuple(p for p in p_list if p <= BITSET_PRIME_MAX) or p_list[:1]
+    table = wheel_table(p_list)
+    w0, k_num = table.wheel, len(table.k_list)
+    m = wheel // w0
+    j_array = np.array(j_list, dtype=np.int64)
+    plus = j_array // w0 * k_num + table.k_index[j_array % w0]
+    minus = (wheel - j_array) // w0 * k_num + table.k_index[(wheel - j_array) % w0]
+    for ca in range(c1, c2, rows):
+        cb = min(ca + rows, c2)
+        # Unpacked bits of rows ca - 1 to cb - 1 of wheel
+        bits = np.zeros(((cb - ca + 1) * m, k_num), dtype=np.uint8)
+        lbound = max(b1, (ca - 1) * wheel, 1)
+        ubound = min(b2, cb * wheel)
+        if lbound < ubound:
+            bitset = PrimeBitset(lbound, ubound, p_list)
+            row = bitset.base - (ca - 1) * m
+            unpacked = np.unpackbits(bitset.bits, axis=1, bitorder="little")
+            bits[row : row + len(bitset.bits)] = unpacked[:, :k_num]
+        bits = bits.reshape(cb - ca + 1, m * k_num)
+        is_prime = bits[1:, plus] | bits[:-1, minus]
+        yield ca - c1, np.packbits(is_prime, axis=1, bitorder="little")
+
+
+class WheelPlan(object):
+    """Stage 2 plan of the pairs (c, j) to multiply in for primes in [b1, b2), shared across
+    curves. Iterating yields (c - c1, j_row) for each row, where j_row lists the indices in
+    j_list of the selected pairs of the row.
+
+    The term of pair (c, j) vanishes for every prime dividing c * wheel + j or
+    c * wheel - j. So with Montgomery's prime pairing, a prime p is covered for free when the
+    pair of a multiple k * p in range is already selected, with k coprime to wheel. Primes are
+    planned from the largest down, in levels [L / k_min, L) where k_min is the smallest such k,
+    so that the pairs of all multiples of a level are final when it is planned. Uncovered
+    primes select their own pair.
+
+    The selected pairs of each row are kept as index lists in CSR form, so that stage 2 only
+    visits the set bits.
+
+    Args:
+        b1 (int): Lower bound of prime range.
+        b2 (int): Upper bound of prime range.
+        wheel (int): Wheel. Typically primorial numbers like 30, 210, 2310.
+
+    Attributes:
+        j_list (list(int)): list of j, as in init_wheel.
+        pair_array (np.array): bitarray of selected pairs in the layout of prime_array of
+            init_wheel, or None when the range has more than PLAN_ROWS rows and is streamed
+            unpaired with iter_wheel.
+        row_ptr (np.array): selected pairs of row c - c1 are j_idx[row_ptr[c - c1] :
+            row_ptr[c - c1 + 1]], or None when streamed.
+        j_idx (np.array): indices in j_list of the selected pairs, row by row, or None when
+            streamed.
+    """
+
+    def __init__(self, b1, b2, wheel):
+        super(WheelPlan, self).__init__()
+        self.b1 = b1
+        self.b2 = b2
+        self.wheel = wheel
+        self.j_list = [j for j in range(1, wheel // 2) if gcd(j, wheel) == 1]
+        self.pair_array = self.row_ptr = self.j_idx = None
+        if b2 // wheel + 2 - b1 // wheel <= PLAN_ROWS:
+            self.pair_array = _pair_primes(b1, b2, wheel, self.j_list)
+            self.row_ptr, self.j_idx = _csr(self.pair_array, len(self.j_list))
+
+    def __iter__(self):
+        if self.pair_array is None:
+            windows = (
+                (c,) + _csr(prime_rows, len(self.j_list))
+                for c, prime_rows in iter_wheel(self.b1, self.b2, self.wheel)
+            )
+        else:
+            windows = [(0, self.row_ptr, self.j_idx)]
+        for c, row_ptr, j_idx in windows:
+            row_ptr, j_idx = row_ptr.tolist(), j_idx.tolist()
+            for row in range(len(row_ptr) - 1):
+                yield c + row, j_idx[row_ptr[row] : row_ptr[row + 1]]
+
+
+# (b1, b2, wheel) -> WheelPlan
+_WHEEL_PLANS = dict()
+
+
+def wheel_plan(b1, b2, wheel):
+    """Stage 2 plan for primes in [b1, b2), shared across calls.
+
+    Args:
+        b1 (int): Lower bound of prime range.
+        b2 (int): Upper bound of prime range.
+        wheel (int): Wheel. Typically primorial numbers like 30, 210, 2310.
+
+    Returns:
+        WheelPlan: stage 2 plan.
+    """
+    key = (b1, b2, wheel)
+    if key not in _WHEEL_PLANS:
+        _WHEEL_PLANS[key] = WheelPlan(b1, b2, wheel)
+    return _WHEEL_PLANS[key]
+
+
+def _pair_primes(b1, b2, wheel, j_list):
+    # Bitarray of selected pairs of WheelPlan, in the layout of prime_array of init_wheel.
+    c1 = b1 // wheel
+    c2 = b2 // wheel + 2
+    j_num = len(j_list)
+    j_index = np.full(wheel, -1, dtype=np.int64)
+    j_index[j_list] = np.arange(j_num)
+
+    def pair_index(x):
+        # Flat index (c - c1) * j_num + (index of j) of the pair of each number of x
+        c, r = np.divmod(x, wheel)
+        upper = r > wheel // 2
+        return (c + upper - c1) * j_num + j_index[np.where(upper, wheel - r, r)]
+
+    # Numbers below limit have pairs in rows below c2.
+    limit = c2 * wheel - wheel // 2
+    primes = wheel_sieve_array(max(b1, 1), b2).astype(np.int64)
+    primes = primes[j_index[np.minimum(primes % wheel, wheel - primes % wheel)] >= 0]
+    k_list = [k for k in range(2, limit // max(b1, 1) + 1) if gcd(k, wheel) == 1]
+    selected = np.zeros((c2 - c1) * j_num, dtype=bool)
+    hi = len(primes)
+    level = limit
+    while hi > 0:
+        level = -(-level // k_list[0]) if k_list else 0
+        lo = int(np.searchsorted(primes, level))
+        block = primes[lo:hi]
+        covered = np.zeros(len(block), dtype=bool)
+        for k in k_list:
+            num = int(np.searchsorted(block, -(-limit // k)))
+            if num == 0:
+                break
+            covered[:num] |= selected[pair_index(block[:num] * k)]
+        selected[pair_index(block[~covered])] = True
+        hi = lo
+    return np.packbits(selected.reshape(c2 - c1, j_num), axis=1, bitorder="little")
+
+
+def _csr(prime_rows, j_num):
+    # Row pointers and column indices of the set bits of packed rows, as np.int64 arrays.
+    bits = np.unpackbits(prime_rows, axis=1, bitorder="little")[:, :j_num]
+    rows, j_idx = np.nonzero(bits)
+    row_ptr = np.zeros(len(prime_rows) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(prime_rows)), out=row_ptr[1:])
+    return row_ptr, j_idx.astype(np.int64)
+
+
 def inv_multi(element_list, n):
     """Compute inverse (mod n) of multiple elements.
     Uses Montgomery's trick so that for a list of length k, it only takes 1 modular inverse and
@@ -3,12 +3,10 @@
 import random
 import time
 from math import gcd
-import numpy as np
 from wheel_sieve.common import (
-    PRIME_GEN,
     InverseNotFound,
     CurveInitFail,
-    init_wheel,
+    wheel_plan,
     inv_multi,
 )
 import wheel_sieve.ecm.ecm_montgomery as mnt
@@ -115,41 +113,22 @@ def ecm(n, rounds, b1, b2):
         raise ValueError
     wheel = 2310
     st = time.time()
-    j_list, prime_array = init_wheel(b1, b2, wheel)
+    plan = wheel_plan(b1, b2, wheel)
+    j_list = plan.j_list
     print("Init time: {:.2f}".format(time.time() - st))
     for round_i in range(rounds):
         st = time.time()
         print("Round {}...".format(round_i))
-        count = 0
-        success = False
-        while not success and count < 20:
-            try:
-                count += 1
-                sigma = random.randint(6, n - 6)
-                mnt_pt, mnt_curve = mnt.get_curve_suyama(sigma, n)
-                success = True
-            except InverseNotFound as e:
-                res = gcd(e.x, n)
-                if 1 < res < n:
-                    return res
-            except CurveInitFail:
-                pass
-        if not success:
-            print(" - Curve Init Failed.")
-            break
         try:
             # Step 1
             print("{:>5.2f}: Step 1".format(time.time() - st))
-            for p in PRIME_GEN(b1):
-                for _ in range(int(np.log(b1) / np.log(p))):
-                    mnt_pt = mnt.mul_pt_exn(mnt_pt, mnt_curve, p)
+            mnt_pt, mnt_curve = mnt.get_curve_random(n)
+            mnt_pt = mnt.check(mnt.stage1(mnt_pt, mnt_curve, b1), mnt_curve)
             # Step 2
             print("{:>5.2f}: Step 2".format(time.time() - st))
             polynomial = (2, 0, 9, 0, 6, 0, 1)  # f(x) = x^6 + 6x^4 + 9x^2 + 2
             q, wst_curve = mnt.to_weierstrass(mnt_pt, mnt_curve)
             c1 = b1 // wheel
-            c2 = b2 // wheel + 2
-            c = 0
             k_ls = [
                 apply_polynomial(polynomial, j) for j in j_list
             ] + get_difference_seq(polynomial, c1 * wheel, wheel)
@@ -158,18 +137,16 @@ def ecm(n, rounds, b1, b2):
             for i in range(len(j_list)):
                 xj_list.append(mul_res[i][0])
             cq_list = mul_res[len(j_list) :]
-            while c < c2 - c1:
+            # Selected pairs of each row of the plan, streamed in windows for long ranges.
+            for c, j_row in plan:
                 # assert cq_list[0] == wst.mul_pt_exn(
                 #     q, wst_curve, apply_polynomial(polynomial, (c + c1) * wheel)
                 # )
                 s = cq_list[0][1] if cq_list[0][1] != 0 else 1
-                for xj, is_prime in zip(
-                    xj_list, np.unpackbits(prime_array[c, :], bitorder="little")
-                ):
-                    if is_prime:
-                        t = (cq_list[0][0] - xj) % n
-                        if t != 0:
-                            s = s * t % n
+                for j_i in j_row:
+                    t = (cq_list[0][0] - xj_list[j_i]) % n
+                    if t != 0:
+                        s = s * t % n
                 res = gcd(s, n)
                 if 1 < res < n:
                     return res
@@ -184,9 +161,11 @@ def ecm(n, rounds, b1, b2):
                     # s is a multiple of n while each of cq_list[0][1] and {(cq_list[0][0] - xj) % n} is not.
                     # There must be at least 2 non-trivial factors. The function should have returned.
                     assert False
-                c += 1
                 step_difference_seq_exn(cq_list, wst_curve)
             print("{:>5.2f}: End".format(time.time() - st))
+        except CurveInitFail:
+            print(" - Curve Init Failed.")
+            break
         except InverseNotFound as e:
             res = gcd(e.x, n)
             if 1 < res < n:
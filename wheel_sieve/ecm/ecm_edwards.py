@@ -0,0 +1,451 @@
+"""Elliptic Curve Method using Twisted Edwards Curves with a = -1 and extended coordinates.
+"""
+import random
+import time
+from math import gcd
+from wheel_sieve.common import InverseNotFound, CurveInitFail, inv
+import wheel_sieve.ecm.ecm_montgomery as mnt
+import wheel_sieve.ecm.ecm_polyeval as ecm_polyeval
+import wheel_sieve.ecm.ecm_weierstrass as wst
+
+# Width of the NAF of the stage 1 multiplier. Odd multiples up to 2 ** (NAF_WIDTH - 1) of the
+# point are precomputed.
+NAF_WIDTH = 6
+
+# Auxiliary curve y**2 = x**3 + a*x + b and its point of infinite order generating sigma.
+# x maps to sigma = 5 + 1080 / (x - 213), and y to the square root of
+# (sigma - 5) * (sigma + 1) * (3 * sigma - 5) * (sigma + 3) = 720 * y / (x - 213) ** 2.
+AUX_CURVE = (-9747, 285714)
+AUX_POINT = (393, 7560)
+
+
+def get_sigma(k, n):
+    """Parameter sigma of Suyama's parametrization for which the curve is a twisted Edwards
+    curve with a = -1, from the multiple kG of AUX_POINT on AUX_CURVE.
+
+    Args:
+        k (int): Multiplier. k >= 1.
+        n (int): Modulus.
+
+    Raises:
+        InverseNotFound: Thrown when an inverse (mod n) does not exist on the way.
+
+    Returns:
+        tuple(int, int): (sigma, w), where
+        w ** 2 == (sigma - 5) * (sigma + 1) * (3 * sigma - 5) * (sigma + 3) (mod n).
+    """
+    a, b = AUX_CURVE
+    x, y = wst.mul_pt_exn(AUX_POINT, (a % n, b % n, n), k)
+    t = inv(x - 213, n)
+    sigma = (5 + 1080 * t) % n
+    w = 720 * y * t * t % n
+    return sigma, w
+
+
+def get_curve_suyama(sigma, w, n):
+    """Given parameter sigma, generate an Elliptic Curve (mod n) and a point on it using
+    Suyama's parametrization, as a twisted Edwards curve with a = -1.
+
+    The curve is Suyama's Montgomery curve of ecm_montgomery, so its group order is a multiple
+    of 12. It is a twisted Edwards curve with a = -1 when
+    w ** 2 == (sigma - 5) * (sigma + 1) * (3 * sigma - 5) * (sigma + 3) (mod n), as with
+    get_sigma.
+
+    Args:
+        sigma (int): The sigma parameter.
+        w (int): Square root of (sigma - 5) * (sigma + 1) * (3 * sigma - 5) * (sigma + 3).
+        n (int): Modulus.
+
+    Raises:
+        CurveInitFail: Thrown when the curve generated by the given parameters fails the
+            necessary conditions.
+        InverseNotFound: Thrown when an inverse (mod n) does not exist on the way.
+
+    Returns:
+        tuple(tuple(int, int, int, int), tuple(int, int, int)): (Point, Curve), where
+
+         -  Point = (X, Y, Z, T) in extended coordinates, with x = X/Z, y = Y/Z and
+            T = X*Y/Z.
+         -  Curve = (d, k, n),
+            representing -x ** 2 + y ** 2 == 1 + d * x ** 2 * y ** 2 (mod n).
+
+             -  k = 2 * d % n is precomputed for point addition.
+
+    """
+    (x0, z0), (A, _s, _n) = mnt.get_curve_suyama(sigma, n)
+    u = (sigma ** 2 - 5) % n
+    v = 4 * sigma % n
+    # Point of the Montgomery curve B * y ** 2 = x ** 3 + A * x ** 2 + x, with B = u / z0
+    y0 = (sigma ** 2 - 1) * (sigma ** 2 - 25) * (sigma ** 4 - 25) % n
+    # Map to the twisted Edwards curve a * x ** 2 + y ** 2 = 1 + d * x ** 2 * y ** 2, with
+    # a = (A + 2) / B. Scaling x by c, where c ** 2 = -a, gives a = -1.
+    c = (v - u) * v * w * inv(2 * u * u, n) % n
+    xe = c * x0 * inv(y0, n) % n
+    ye = (x0 - z0) * inv(x0 + z0, n) % n
+    d = (2 - A) * inv(2 + A, n) % n
+    if xe == 0 or ye == 0 or d in (0, n - 1):
+        raise CurveInitFail()
+    return (xe, ye, 1, xe * ye % n), (d, 2 * d % n, n)
+
+
+def get_curve_random(n, tries=20):
+    """Generate a random twisted Edwards curve (mod n) with a = -1 and a point on it, with
+    get_sigma and get_curve_suyama, retrying with another multiplier when the curve fails the
+    necessary conditions.
+
+    Args:
+        n (int): Modulus.
+        tries (int, optional): Number of multipliers to try. Defaults to 20.
+
+    Raises:
+        InverseNotFound: Thrown when a non-trivial factor of n is found.
+        CurveInitFail: Thrown when all tries fail.
+
+    Returns:
+        tuple(tuple(int, int, int, int), tuple(int, int, int)): (Point, Curve), as in
+        get_curve_suyama.
+    """
+    for _ in range(tries):
+        try:
+            sigma, w = get_sigma(random.randint(2, 1 << 32), n)
+            return get_curve_suyama(sigma, w, n)
+        except InverseNotFound as e:
+            if 1 < gcd(e.x, n) < n:
+                raise
+        except CurveInitFail:
+            pass
+    raise CurveInitFail()
+
+
+def add_pt(ptp, ptq, curve):
+    """Computes point P+Q given points P, Q and curve. Also correct when P == Q.
+
+    Args:
+        ptp (tuple(int, int, int, int)): Point P.
+        ptq (tuple(int, int, int, int)): Point Q.
+        curve (tuple(int, int, int)): Curve.
+
+    Returns:
+        tuple(int, int, int, int): Point P+Q.
+    """
+    xp, yp, zp, tp = ptp
+    xq, yq, zq, tq = ptq
+    _d, k, n = curve
+    a = (yp - xp) * (yq - xq) % n
+    b = (yp + xp) * (yq + xq) % n
+    c = tp * k % n * tq % n
+    d = 2 * zp * zq % n
+    e, f, g, h = b - a, d - c, d + c, b + a
+    return (e * f % n, g * h % n, f * g % n, e * h % n)
+
+
+def dbl_pt(pt, curve):
+    """Computes point 2P given point P and curve.
+
+    Args:
+        pt (tuple(int, int, int, int)): Point P.
+        curve (tuple(int, int, int)): Curve.
+
+    Returns:
+        tuple(int, int, int, int): Point 2P.
+    """
+    x, y, z, _t = pt
+    _d, _k, n = curve
+    a = x * x % n
+    b = y * y % n
+    c = 2 * z * z % n
+    e = (x + y) ** 2 - a - b
+    g = b - a
+    f = g - c
+    h = -a - b
+    return (e * f % n, g * h % n, f * g % n, e * h % n)
+
+
+def neg_pt(pt, curve):
+    """Negate a point.
+
+    Args:
+        pt (tuple(int, int, int, int)): Point P.
+        curve (tuple(int, int, int)): Curve.
+
+    Returns:
+        tuple(int, int, int, int): Point -P.
+    """
+    x, y, z, t = pt
+    _d, _k, n = curve
+    return (-x % n, y, z, -t % n)
+
+
+def naf(k, width=None):
+    """Width-w non-adjacent form of k. Each non-zero digit is odd, below 2 ** (width - 1) in
+    absolute value, and followed by at least width - 1 zeros.
+
+    Args:
+        k (int): Non-negative integer.
+        width (int, optional): Width w. width >= 2. Defaults to None, using NAF_WIDTH.
+
+    Returns:
+        list(int): Digits, least significant first, with sum(digit << i) == k.
+    """
+    if width is None:
+        width = NAF_WIDTH
+    # Windows are read from the bits of k, least significant first, plus the carry left by
+    # negative digits, so that k itself is never shifted.
+    bits = bin(k)[:1:-1]
+    digits = []
+    carry = 0
+    i = 0
+    while i < len(bits) or carry:
+        window = int(bits[i : i + width][::-1] or "0", 2) + carry
+        if window % 2 == 0:
+            # Bit i equals the carry, which is passed on.
+            digits.append(0)
+            i += 1
+            continue
+        if window >= 1 << (width - 1):
+            digits.append(window - (1 << width))
+            carry = 1
+        else:
+            digits.append(window)
+            carry = 0
+        digits.extend([0] * (width - 1))
+        i += width
+    while digits and digits[-1] == 0:
+        digits.pop()
+    return digits
+
+
+def mul_pt(pt, curve, k):
+    """Computes point kP given point P, curve and k using the width-w NAF of k.
+
+    Args:
+        pt (tuple(int, int, int, int)): Point P.
+        curve (tuple(int, int, int)): Curve.
+        k (int): Multiplier. k >= 0.
+
+    Returns:
+        tuple(int, int, int, int): Point kP.
+    """
+    table = odd_multiples(pt, curve, 1 << (NAF_WIDTH - 2))
+    res = (0, 1, 1, 0)
+    for digit in reversed(naf(k)):
+        res = dbl_pt(res, curve)
+        if digit > 0:
+            res = add_pt(res, table[digit // 2], curve)
+        elif digit < 0:
+            res = add_pt(res, neg_pt(table[-digit // 2], curve), curve)
+    return res
+
+
+def odd_multiples(pt, curve, count):
+    """Odd multiples P, 3P, 5P, ... of point P.
+
+    Args:
+        pt (tuple(int, int, int, int)): Point P.
+        curve (tuple(int, int, int)): Curve.
+        count (int): Number of multiples. count >= 1.
+
+    Returns:
+        list(tuple(int, int, int, int)): Points (2i+1)P for 0 <= i < count.
+    """
+    pt2 = dbl_pt(pt, curve)
+    table = [pt]
+    for _ in range(count - 1):
+        table.append(add_pt(table[-1], pt2, curve))
+    return table
+
+
+# b1 -> list of (doublings, digit)
+_STAGE1_SCHEDULES = dict()
+
+
+def stage1_schedule(b1):
+    """Steps of the multiplication by the product of the prime powers of
+    ecm_montgomery.stage1_schedule(b1), from its width-w NAF. Cached per b1.
+
+    Args:
+        b1 (int): Bound for primes used in step 1.
+
+    Returns:
+        list(tuple(int, int)): Leading digit (0, digit), followed by (doublings, digit) for each
+        following non-zero digit, and (doublings, 0) for trailing zeros, most significant
+        first.
+    """
+    if b1 not in _STAGE1_SCHEDULES:
+        # Balanced product, as a running product grows quadratically in cost.
+        factors = list(mnt.stage1_schedule(b1))
+        while len(factors) > 1:
+            factors = [
+                factors[i] * factors[i + 1] if i + 1 < len(factors) else factors[i]
+                for i in range(0, len(factors), 2)
+            ]
+        schedule = []
+        doublings = 0
+        for digit in reversed(naf(factors[0] if factors else 1)):
+            if digit != 0:
+                schedule.append((doublings, digit))
+                doublings = 0
+            doublings += 1
+        if doublings > 1:
+            schedule.append((doublings - 1, 0))
+        _STAGE1_SCHEDULES[b1] = schedule
+    return _STAGE1_SCHEDULES[b1]
+
+
+def stage1(pt, curve, b1):
+    """Multiply point P by every prime power of ecm_montgomery.stage1_schedule(b1) at once,
+    using the width-w NAF of their product. Doublings and additions are inlined. T is only
+    computed by the doublings followed by an addition, and additions take the odd multiples
+    of P as (Y - X, Y + X, 2d * T, 2Z).
+
+    The result is not checked.
+
+    Args:
+        pt (tuple(int, int, int, int)): Point P.
+        curve (tuple(int, int, int)): Curve.
+        b1 (int): Bound for primes used in step 1.
+
+    Returns:
+        tuple(int, int, int, int): Point after stage 1, with T left as 0.
+    """
+    _d, k, n = curve
+    table = odd_multiples(pt, curve, 1 << (NAF_WIDTH - 2))
+    cached = [((y - x) % n, (y + x) % n, k * t % n, 2 * z % n) for x, y, z, t in table]
+    schedule = stage1_schedule(b1)
+    x, y, z, t = table[schedule[0][1] // 2]
+    for doublings, digit in schedule[1:]:
+        for _ in range(doublings):
+            a = x * x % n
+            b = y * y % n
+            c = 2 * z * z % n
+            e = (x + y) ** 2 - a - b
+            g = b - a
+            f = g - c
+            h = -a - b
+            x, y, z = e * f % n, g * h % n, f * g % n
+        if digit == 0:
+            break
+        # T of the last doubling
+        t = e * h % n
+        if digit > 0:
+            ym, yp, kt, z2 = cached[digit // 2]
+        else:
+            yp, ym, kt, z2 = cached[-digit // 2]
+            kt = -kt
+        a = (y - x) * ym % n
+        b = (y + x) * yp % n
+        c = t * kt % n
+        d = z * z2 % n
+        e, f, g, h = b - a, d - c, d + c, b + a
+        x, y, z = e * f % n, g * h % n, f * g % n
+    return (x, y, z, 0)
+
+
+def check(pt, curve):
+    """Given point P (X, Y, Z, T), check that P is not the neutral element (0, 1) nor the point
+    (0, -1) of order 2, i.e. gcd(X, n) == 1, and return P.
+
+    Args:
+        pt (tuple(int, int, int, int)): Point P.
+        curve (tuple(int, int, int)): Curve.
+
+    Raises:
+        InverseNotFound: Thrown when x == 0.
+
+    Returns:
+        tuple(int, int, int, int): Point P.
+    """
+    x, _y, _z, _t = pt
+    _d, _k, n = curve
+    if gcd(x, n) > 1:
+        raise InverseNotFound(x, n)
+    return pt
+
+
+def to_montgomery(pt, curve):
+    """Given a point P and the twisted Edwards curve it is on, computes the equivalent point
+    and curve in Montgomery form and XZ coordinates, as in ecm_montgomery.
+
+    Args:
+        pt (tuple(int, int, int, int)): Point P in extended coordinates.
+        curve (tuple(int, int, int)): Curve in twisted Edwards form.
+
+    Raises:
+        InverseNotFound: Thrown when 1 + d is not invertible (mod n).
+
+    Returns:
+        tuple(tuple(int, int), tuple(int, int, int)): (Point, Curve) in Montgomery form, with
+        x = (1 + y) / (1 - y) and A = 2 * (1 - d) / (1 + d).
+    """
+    _x, y, z, _t = pt
+    d, _k, n = curve
+    s = inv(1 + d, n)
+    return ((z + y) % n, (z - y) % n), (2 * (1 - d) * s % n, s, n)
+
+
+def ecm(n, rounds, b1, b2, wheel=2310, output=True):
+    """Elliptic Curve Factorization Method. In each round, the following steps are performed:
+
+        0. Generate random point and twisted Edwards curve with a = -1.
+        1. Multiply the point by the product of small primes raised to some power, determined
+           by b1, using its width-w NAF.
+        2. Map the point to Montgomery form, and apply the standard continuation from b1 to b2
+           of ecm_polyeval.
+
+    Returns when a non-trivial factor is found.
+
+    Args:
+        n (int): Number to be factorized. n >= 12.
+        rounds (int): Number of random curves to try.
+        b1 (int): Bound for primes used in step 1.
+        b2 (int): Bound for primes searched for in step 2. b1 < b2.
+        wheel (int, optional): Wheel, where only numbers coprime to wheel will be considered in
+            step 2. Defaults to 2310.
+        output (bool, optional): Whether to print progress to stdout. Defaults to True.
+
+    Raises:
+        ValueError: Thrown when n < 12.
+
+    Returns:
+        int: Non-trivial factor if found, otherwise returns None.
+    """
+    if n < 12:
+        raise ValueError
+    for round_i in range(rounds):
+        if output:
+            st = time.time()
+            print("Round {}...".format(round_i))
+        try:
+            # Step 1
+            if output:
+                print("{:>5.2f}: Step 1".format(time.time() - st))
+            pt, curve = get_curve_random(n)
+            pt = check(stage1(pt, curve, b1), curve)
+            # Step 2
+            if output:
+                print("{:>5.2f}: Step 2".format(time.time() - st))
+            mnt_pt, mnt_curve = to_montgomery(pt, curve)
+            res = ecm_polyeval.stage2(mnt_pt, mnt_curve, b1, b2, wheel)
+            if res is not None:
+                return res
+            if output:
+                print("{:>5.2f}: End".format(time.time() - st))
+        except CurveInitFail:
+            if output:
+                print(" - Curve Init Failed.")
+            break
+        except InverseNotFound as e:
+            res = gcd(e.x, n)
+            if 1 < res < n:
+                return res
+    return None
+
+
+if __name__ == "__main__":
+    # (406724252548875212358759885439 * 724413085648406196306771670711)
+    num = 294636370796972331405770334382449402989049465216208991677129
+    for name, func in (("polyeval", ecm_polyeval.ecm), ("edwards", ecm)):
+        random.seed(2)
+        st = time.time()
+        res = func(num, 4, 250_000, 4_000_000, output=False)
+        print("{:>8}: {}, {:.2f}s".format(name, res, time.time() - st))
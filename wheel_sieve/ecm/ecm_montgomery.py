@@ -3,13 +3,40 @@
 import random
 import time
 from math import gcd
-import numpy as np
 from wheel_sieve.common import (
     PRIME_GEN,
     InverseNotFound,
     CurveInitFail,
     inv,
-    init_wheel,
+    wheel_plan,
+)
+
+# Ratios k / r tried for the first step of PRAC chains, as in GMP-ECM. The first is the
+# golden ratio.
+PRAC_RATIOS = (
+    0.61803398874989485,
+    0.72360679774997897,
+    0.58017872829546410,
+    0.63283980608870629,
+    0.61242994950949500,
+)
+
+# Cost, in field multiplications, of a differential addition and of a doubling
+ADD_COST = 6
+DBL_COST = 5
+
+# Cost of each rule of PRAC chains, indexed by rule from 1
+PRAC_RULE_COSTS = (
+    None,
+    3 * ADD_COST,
+    ADD_COST + DBL_COST,
+    ADD_COST,
+    ADD_COST + DBL_COST,
+    ADD_COST + DBL_COST,
+    3 * ADD_COST + DBL_COST,
+    3 * ADD_COST + DBL_COST,
+    3 * ADD_COST + DBL_COST,
+    ADD_COST + DBL_COST,
 )
 
 
@@ -235,6 +262,293 @@ def mul_pt_exn(pt, curve, k):
     return check(res0, curve)
 
 
+def get_curve_random(n, tries=20):
+    """Generate a random Elliptic Curve (mod n) and a point on it using Suyama's
+    parametrization, retrying with another sigma when the curve fails the necessary conditions.
+
+    Args:
+        n (int): Modulus.
+        tries (int, optional): Number of sigmas to try. Defaults to 20.
+
+    Raises:
+        InverseNotFound: Thrown when a non-trivial factor of n is found.
+        CurveInitFail: Thrown when all tries fail.
+
+    Returns:
+        tuple(tuple(int, int), tuple(int, int, int)): (Point, Curve), as in get_curve_suyama.
+    """
+    for _ in range(tries):
+        try:
+            sigma = random.randint(6, n - 6)
+            return get_curve_suyama(sigma, n)
+        except InverseNotFound as e:
+            if 1 < gcd(e.x, n) < n:
+                raise
+        except CurveInitFail:
+            pass
+    raise CurveInitFail()
+
+
+# b1 -> list of prime powers
+_STAGE1_SCHEDULES = dict()
+
+
+def stage1_schedule(b1):
+    """Multipliers of stage 1: for each prime p < b1, the largest power of p not above b1.
+    Cached per b1.
+
+    Args:
+        b1 (int): Bound for primes used in step 1.
+
+    Returns:
+        list(int): Prime powers, in ascending order of primes.
+    """
+    if b1 not in _STAGE1_SCHEDULES:
+        schedule = []
+        for p in PRIME_GEN(b1):
+            power = p
+            while power * p <= b1:
+                power *= p
+            schedule.append(power)
+        _STAGE1_SCHEDULES[b1] = schedule
+    return _STAGE1_SCHEDULES[b1]
+
+
+# k -> tuple of rules, or None when the ladder is used
+_PRAC_CHAINS = dict()
+
+
+def prac_chain(k):
+    """Rules of the cheapest PRAC chain for k among PRAC_RATIOS, following Montgomery's
+    "Evaluating recurrences of form X_{m+n} = f(X_m, X_n, X_{m-n}) via Lucas chains".
+    Cached per k.
+
+    The chain keeps points A, B, C with C = A - B, and k = d * A + e * B. It starts from
+    A = 2P, B = C = P, applies one rule per step to shrink (d, e) until d == e == 1, then
+    ends with A + B.
+
+    Args:
+        k (int): Multiplier. k >= 1.
+
+    Returns:
+        tuple(int) or None: Rules 1 to 9 of the chain, plus 10 for the steps swapping d and e
+        first, or None when no chain is cheaper than the Montgomery ladder.
+    """
+    if k not in _PRAC_CHAINS:
+        best = None
+        best_cost = (k.bit_length() - 1) * (ADD_COST + DBL_COST)
+        for ratio in PRAC_RATIOS:
+            rules = _prac_rules(k, ratio)
+            if rules is None:
+                continue
+            cost = (
+                DBL_COST + ADD_COST + sum(PRAC_RULE_COSTS[rule % 10] for rule in rules)
+            )
+            if cost < best_cost:
+                best, best_cost = rules, cost
+        _PRAC_CHAINS[k] = best
+    return _PRAC_CHAINS[k]
+
+
+def _prac_rules(k, ratio):
+    # Rules of the PRAC chain for k starting with r = k * ratio, or None when the chain
+    # does not reach d == 1.
+    r = int(k * ratio + 0.5)
+    d = k - r
+    e = 2 * r - k
+    if d <= 0 or e <= 0:
+        return None
+    rules = []
+    while d != e:
+        swap = 0
+        if d < e:
+            d, e = e, d
+            swap = 10
+        if 4 * d <= 5 * e and (d + e) % 3 == 0:
+            d, e = (2 * d - e) // 3, (2 * e - d) // 3
+            rules.append(swap + 1)
+        elif 4 * d <= 5 * e and (d - e) % 6 == 0:
+            d = (d - e) // 2
+            rules.append(swap + 2)
+        elif d <= 4 * e:
+            d -= e
+            rules.append(swap + 3)
+        elif (d + e) % 2 == 0:
+            d = (d - e) // 2
+            rules.append(swap + 4)
+        elif d % 2 == 0:
+            d //= 2
+            rules.append(swap + 5)
+        elif d % 3 == 0:
+            d = d // 3 - e
+            rules.append(swap + 6)
+        elif (d + e) % 3 == 0:
+            d = (d - 2 * e) // 3
+            rules.append(swap + 7)
+        elif (d - e) % 3 == 0:
+            d = (d - e) // 3
+            rules.append(swap + 8)
+        else:
+            e //= 2
+            rules.append(swap + 9)
+    return tuple(rules) if d == 1 else None
+
+
+def mul_pt_prac(pt, curve, k):
+    """Computes point kP given point P, curve and k, using the chain of prac_chain(k), or the
+    Montgomery Ladder when there is none. The result is not checked.
+
+    Args:
+        pt (tuple(int, int)): Point P.
+        curve (tuple(int, int, int)): Curve.
+        k (int): Multiplier. k >= 1.
+
+    Returns:
+        tuple(int, int): Point kP.
+    """
+    x, z = pt
+    _A, s, n = curve
+    if k == 1:
+        return pt
+    rules = prac_chain(k)
+    if rules is None:
+        return _ladder(x, z, s, n, bin(k)[3:])
+    return _prac(x, z, s, n, rules)
+
+
+# Differential addition and doubling of add_pt and dbl_pt, on bare coordinates.
+
+
+def _add(xp, zp, xq, zq, x_, z_, n):
+    u = (xp - zp) * (xq + zq) % n
+    v = (xp + zp) * (xq - zq) % n
+    return z_ * ((u + v) ** 2 % n) % n, x_ * ((u - v) ** 2 % n) % n
+
+
+def _dbl(x, z, s, n):
+    a = (x + z) ** 2 % n
+    b = (x - z) ** 2 % n
+    t = a - b
+    return a * b % n, t * ((b + s * t) % n) % n
+
+
+def _ladder(x, z, s, n, bits):
+    # Montgomery Ladder for the multiplier with bits after the leading one.
+    # (x0, z0) = k' * P and (x1, z1) = (k' + 1) * P for the leading bits k' of k
+    x0, z0 = x, z
+    x1, z1 = _dbl(x, z, s, n)
+    for bit in bits:
+        if bit == "1":
+            x0, z0 = _add(x1, z1, x0, z0, x, z, n)
+            x1, z1 = _dbl(x1, z1, s, n)
+        else:
+            x1, z1 = _add(x1, z1, x0, z0, x, z, n)
+            x0, z0 = _dbl(x0, z0, s, n)
+    return x0, z0
+
+
+def _prac(x, z, s, n, rules):
+    # PRAC chain of prac_chain. Points A = (x, z), B = (xb, zb), C = (xc, zc), and
+    # temporaries T, U. Renaming points costs nothing, so the rules of GMP-ECM that swap
+    # points are applied by swapping names.
+    xb, zb, xc, zc = x, z, x, z
+    x, z = _dbl(x, z, s, n)
+    for rule in rules:
+        if rule > 9:
+            # Swap d and e first
+            x, z, xb, zb = xb, zb, x, z
+            rule -= 10
+        if rule == 3:
+            # Rule 3: d -= e. _add is inlined, as most steps are rule 3.
+            u = (xb - zb) * (x + z) % n
+            v = (xb + zb) * (x - z) % n
+            xb, zb, xc, zc = (
+                zc * ((u + v) ** 2 % n) % n,
+                xc * ((u - v) ** 2 % n) % n,
+                xb,
+                zb,
+            )
+        elif rule == 4 or rule == 2:
+            # Rules 2 and 4: d = (d - e) / 2
+            xb, zb = _add(xb, zb, x, z, xc, zc, n)
+            x, z = _dbl(x, z, s, n)
+        elif rule == 5:
+            # Rule 5: d /= 2
+            xc, zc = _add(xc, zc, x, z, xb, zb, n)
+            x, z = _dbl(x, z, s, n)
+        elif rule == 1:
+            # Rule 1: d, e = (2d - e) / 3, (2e - d) / 3
+            xt, zt = _add(x, z, xb, zb, xc, zc, n)
+            xu, zu = _add(xt, zt, x, z, xb, zb, n)
+            xb, zb = _add(xb, zb, xt, zt, x, z, n)
+            x, z = xu, zu
+        elif rule == 6:
+            # Rule 6: d = d / 3 - e
+            xt, zt = _dbl(x, z, s, n)
+            xu, zu = _add(x, z, xb, zb, xc, zc, n)
+            x, z = _add(xt, zt, x, z, x, z, n)
+            xt, zt = _add(xt, zt, xu, zu, xc, zc, n)
+            xb, zb, xc, zc = xt, zt, xb, zb
+        elif rule == 7:
+            # Rule 7: d = (d - 2e) / 3
+            xt, zt = _add(x, z, xb, zb, xc, zc, n)
+            xb, zb = _add(xt, zt, x, z, xb, zb, n)
+            xt, zt = _dbl(x, z, s, n)
+            x, z = _add(x, z, xt, zt, x, z, n)
+        elif rule == 8:
+            # Rule 8: d = (d - e) / 3
+            xt, zt = _add(x, z, xb, zb, xc, zc, n)
+            xc, zc = _add(xc, zc, x, z, xb, zb, n)
+            xb, zb = xt, zt
+            xt, zt = _dbl(x, z, s, n)
+            x, z = _add(x, z, xt, zt, x, z, n)
+        else:
+            # Rule 9: e /= 2
+            xc, zc = _add(xc, zc, xb, zb, x, z, n)
+            xb, zb = _dbl(xb, zb, s, n)
+    return _add(x, z, xb, zb, xc, zc, n)
+
+
+# b1 -> list of chains, one per prime factor of the multiplier of stage 1
+_STAGE1_CHAINS = dict()
+
+
+def stage1(pt, curve, b1):
+    """Multiply point P by every prime power of stage1_schedule(b1). A prime power p^e is
+    applied as e multiplications by p, each with the PRAC chain of p, or the Montgomery Ladder
+    when it is cheaper. The chains are cached per b1 and shared by all curves.
+
+    The point is not checked on the way. A point at infinity (mod p) stays at z == 0 (mod p),
+    so a single check of the result finds the factor.
+
+    Args:
+        pt (tuple(int, int)): Point P.
+        curve (tuple(int, int, int)): Curve.
+        b1 (int): Bound for primes used in step 1.
+
+    Returns:
+        tuple(int, int): Point after stage 1, equal to the multiple by the prime powers in
+        projective coordinates.
+    """
+    if b1 not in _STAGE1_CHAINS:
+        chains = []
+        for p, power in zip(PRIME_GEN(b1), stage1_schedule(b1)):
+            # Ladder bits after the leading one when there is no PRAC chain
+            chain = prac_chain(p) or bin(p)[3:]
+            while power > 1:
+                chains.append(chain)
+                power //= p
+        _STAGE1_CHAINS[b1] = chains
+    x, z = pt
+    _A, s, n = curve
+    for chain in _STAGE1_CHAINS[b1]:
+        if isinstance(chain, str):
+            x, z = _ladder(x, z, s, n, chain)
+        else:
+            x, z = _prac(x, z, s, n, chain)
+    return x, z
+
+
 def check(pt, curve):
     """Given point P (x, z), check that P is not the point at infinity, i.e. gcd(z, n) == 1,
     and return P.
@@ -283,34 +597,17 @@ def ecm(n, rounds, b1, b2):
         raise ValueError
     wheel = 2310
     st = time.time()
-    j_list, prime_array = init_wheel(b1, b2, wheel)
+    plan = wheel_plan(b1, b2, wheel)
+    j_list = plan.j_list
     print("Init time: {:.2f}".format(time.time() - st))
     for round_i in range(rounds):
         st = time.time()
         print("Round {}...".format(round_i))
-        count = 0
-        success = False
-        while not success and count < 20:
-            try:
-                count += 1
-                sigma = random.randint(6, n - 6)
-                pt, curve = get_curve_suyama(sigma, n)
-                success = True
-            except InverseNotFound as e:
-                res = gcd(e.x, n)
-                if 1 < res < n:
-                    return res
-            except CurveInitFail:
-                pass
-        if not success:
-            print(" - Curve Init Failed.")
-            break
         try:
             # Step 1
             print("{:>5.2f}: Step 1".format(time.time() - st))
-            for p in PRIME_GEN(b1):
-                for _ in range(int(np.log(b1) / np.log(p))):
-                    pt = mul_pt_exn(pt, curve, p)
+            pt, curve = get_curve_random(n)
+            pt = check(stage1(pt, curve, b1), curve)
             # Step 2
             print("{:>5.2f}: Step 2".format(time.time() - st))
             q = pt
@@ -320,19 +617,15 @@ def ecm(n, rounds, b1, b2):
                 xj, zj = mul_pt_exn(q, curve, j)
                 xj_list.append(xj * inv(zj, n) % n)
             c1 = b1 // wheel
-            c2 = b2 // wheel + 2
-            c = 0
             cq = mul_pt_exn(q, curve, c1 * wheel)
             cq_ = mul_pt_exn(q, curve, (c1 - 1) * wheel)
-            while c < c2 - c1:
+            # Selected pairs of each row of the plan, streamed in windows for long ranges.
+            for _c, j_row in plan:
                 s = 1
-                for xj, is_prime in zip(
-                    xj_list, np.unpackbits(prime_array[c, :], bitorder="little")
-                ):
-                    if is_prime:
-                        t = (xj * cq[1] - cq[0]) % n
-                        if t != 0:
-                            s = s * t % n
+                for j_i in j_row:
+                    t = (xj_list[j_i] * cq[1] - cq[0]) % n
+                    if t != 0:
+                        s = s * t % n
                 res = gcd(s, n)
                 if 1 < res < n:
                     return res
@@ -344,9 +637,11 @@ def ecm(n, rounds, b1, b2):
                     # s is a multiple of n while each of {(xj *  cq[1] - cq[0]) % n} is not.
                     # There must be at least 2 non-trivial factors. The function should have returned.
                     assert False
-                c += 1
                 cq, cq_ = add_pt_exn(cq, mq, cq_, curve), cq
             print("{:>5.2f}: End".format(time.time() - st))
+        except CurveInitFail:
+            print(" - Curve Init Failed.")
+            break
         except InverseNotFound as e:
             res = gcd(e.x, n)
             if 1 < res < n:
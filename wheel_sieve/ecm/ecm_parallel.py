@@ -0,0 +1,128 @@
+"""Elliptic Curve Method with curves spread across a process pool.
+"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import multiprocessing
+import os
+import random
+import time
+from wheel_sieve.ecm import ecm_polyeval
+
+# Curves tried per task. Smaller tasks waste less work after a factor is found.
+TASK_ROUNDS = 2
+
+# Stop event of the worker processes, set by ecm once a factor is found
+_STOP = None
+
+
+def ecm(n, rounds, b1, b2, workers=None, seed=None, backend=ecm_polyeval.ecm, **kwargs):
+    """Elliptic Curve Factorization Method, trying curves in parallel.
+
+    The rounds are split into tasks of TASK_ROUNDS curves. Task i draws its sigmas from its own
+    random stream, seeded by the i-th number of a stream seeded with seed, so the curves tried
+    do not depend on the number of workers. The state of the global random module is left
+    unchanged.
+
+    Returns as soon as a task finds a non-trivial factor, and cancels the tasks not started
+    yet. Tasks already running check a shared stop event between curves, so they return after
+    their current curve. With several factors in reach, the one returned depends on which task
+    finishes first.
+
+    Args:
+        n (int): Number to be factorized. n >= 12.
+        rounds (int): Number of random curves to try.
+        b1 (int): Bound for primes used in step 1.
+        b2 (int): Bound for primes searched for in step 2. b1 < b2.
+        workers (int, optional): Number of worker processes. Tasks are run in the current
+            process when workers is 1. Defaults to None, using os.cpu_count().
+        seed (int, optional): Seed of the random streams. Defaults to None, seeding from the
+            operating system.
+        backend (function, optional): Module level ecm function trying the curves of a task,
+            called as backend(n, rounds, b1, b2, **kwargs). Defaults to ecm_polyeval.ecm.
+        **kwargs: Keyword arguments passed to backend.
+
+    Raises:
+        ValueError: Thrown when n < 12.
+
+    Returns:
+        int: Non-trivial factor if found, otherwise returns None.
+    """
+    if n < 12:
+        raise ValueError
+    if workers is None:
+        workers = os.cpu_count() or 1
+    seed_gen = random.Random(seed)
+    tasks = [
+        (
+            backend,
+            n,
+            min(TASK_ROUNDS, rounds - i),
+            b1,
+            b2,
+            seed_gen.getrandbits(64),
+            kwargs,
+        )
+        for i in range(0, rounds, TASK_ROUNDS)
+    ]
+    if workers <= 1:
+        for task in tasks:
+            factor = _ecm_task(*task)
+            if factor is not None:
+                return factor
+        return None
+    stop = multiprocessing.Event()
+    executor = ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_task, initargs=(stop,)
+    )
+    pending = set()
+    try:
+        tasks = iter(tasks)
+        while True:
+            # At most 2 * workers tasks are submitted, so that the rest can be dropped at once.
+            for task in tasks:
+                pending.add(executor.submit(_ecm_task, *task))
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                return None
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                factor = future.result()
+                if factor is not None:
+                    return factor
+    finally:
+        stop.set()
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def _init_task(stop):
+    global _STOP
+    _STOP = stop
+
+
+def _ecm_task(backend, n, rounds, b1, b2, seed, kwargs):
+    # Backends draw their curves from the global random module. Its state is restored, as
+    # tasks run in the caller's process when workers is 1. Curves are tried one backend call
+    # at a time from the same random stream, so that the stop event is checked between them.
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        for _ in range(rounds):
+            if _STOP is not None and _STOP.is_set():
+                return None
+            factor = backend(n, 1, b1, b2, **kwargs)
+            if factor is not None:
+                return factor
+        return None
+    finally:
+        random.setstate(state)
+
+
+if __name__ == "__main__":
+    # (1000000000039 * 1000000000061 * 1000000000063)
+    num = 1000000000039 * 1000000000061 * 1000000000063
+    for workers in (1, os.cpu_count()):
+        st = time.time()
+        res = ecm(num, 64, 11_000, 600_000, workers=workers, seed=2, output=False)
+        print("workers {}: {}, {:.2f}s".format(workers, res, time.time() - st))
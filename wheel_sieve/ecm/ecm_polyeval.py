@@ -3,8 +3,7 @@
 import random
 import time
 from math import gcd
-import numpy as np
-from wheel_sieve.common import PRIME_GEN, InverseNotFound, CurveInitFail
+from wheel_sieve.common import InverseNotFound, CurveInitFail
 from wheel_sieve.ecm.ecm_brent_suyama import (
     apply_polynomial,
     get_difference_seq,
@@ -14,6 +13,88 @@ from wheel_sieve.polynomial import Polynomial
 import wheel_sieve.ecm.ecm_montgomery as mnt
 import wheel_sieve.ecm.ecm_weierstrass as wst
 
+# Brent-Suyama polynomial of stage 2, f(x) = x^6 + 6x^4 + 9x^2 + 2
+SUYAMA_POLYNOMIAL = (2, 0, 9, 0, 6, 0, 1)
+
+
+class TreeLayout(object):
+    """Shape of a complete binary tree in list form with leaf_num leaves, as built by
+    product_tree, built once per leaf_num by tree_layout. The root node is at position 0 of
+    the list. The children of node i are node 2*i+1 and node 2*i+2.
+
+    Args:
+        leaf_num (int): Number of leaves, before padding to a power of 2.
+
+    Attributes:
+        leaf_num (int): Number of leaves, before padding to a power of 2.
+        size (int): Number of nodes.
+        leaf_start (int): Position of the first leaf. Leaf i is at leaf_start + i, followed by
+            the padding leaves.
+        levels (list(range)): Positions of the internal nodes of each level, from the parents
+            of the leaves up to the root.
+    """
+
+    def __init__(self, leaf_num):
+        super(TreeLayout, self).__init__()
+        self.leaf_num = leaf_num
+        k = 1
+        while k < leaf_num:
+            k *= 2
+        self.size = 2 * k - 1
+        self.leaf_start = k - 1
+        self.levels = []
+        while k > 1:
+            self.levels.append(range(k // 2 - 1, k - 1))
+            k //= 2
+
+    def new_tree(self, n):
+        """New tree of the layout, with the padding leaves set to the polynomial f(x) = 1.
+        The leaves are to be filled in, then the internal nodes with fill_products.
+
+        Args:
+            n (int): Modulus.
+
+        Returns:
+            list(Polynomial): The tree, with None at the leaves and internal nodes.
+        """
+        tree = [None] * self.size
+        tree[self.leaf_start + self.leaf_num :] = [Polynomial([1], n)] * (
+            self.size - self.leaf_start - self.leaf_num
+        )
+        return tree
+
+    def fill_products(self, tree):
+        """Set each internal node of a tree of the layout to the product of its children.
+
+        Args:
+            tree (list(Polynomial)): Tree with all leaves set.
+
+        Returns:
+            list(Polynomial): The tree, now a Product Tree.
+        """
+        for level in self.levels:
+            for i in level:
+                tree[i] = tree[2 * i + 1] * tree[2 * i + 2]
+        return tree
+
+
+# leaf_num -> TreeLayout
+_TREE_LAYOUTS = dict()
+
+
+def tree_layout(leaf_num):
+    """Shape of the Product Tree of leaf_num polynomials, shared across calls.
+
+    Args:
+        leaf_num (int): Number of leaves.
+
+    Returns:
+        TreeLayout: Shape of the tree.
+    """
+    if leaf_num not in _TREE_LAYOUTS:
+        _TREE_LAYOUTS[leaf_num] = TreeLayout(leaf_num)
+    return _TREE_LAYOUTS[leaf_num]
+
 
 def product_tree(poly_list, n):
     """Product Tree Algorithm. Multiply a list of polynomials, poly_list.
@@ -27,24 +108,15 @@ def product_tree(poly_list, n):
         n (int): Modulus.
 
     Returns:
-        list(Polynomial): The Product Tree, a complete binary tree in list form.
+        list(Polynomial): The Product Tree, a complete binary tree in list form, with the
+        layout of tree_layout(len(poly_list)).
         The root node is at position 0 of the list. The children of node i are
         node 2*i+1 and node 2*i+2.
     """
-    poly_num = len(poly_list)
-    k = 1
-    while k < poly_num:
-        k *= 2
-    res = [None for _ in range(k * 2 - 1)]
-    for i in range(poly_num):
-        res[k + i - 1] = poly_list[i]
-    for i in range(poly_num, k):
-        res[k + i - 1] = Polynomial([1], n)
-    while k > 1:
-        for i in range(k // 2 - 1, k - 1):
-            res[i] = res[2 * i + 1] * res[2 * i + 2]
-        k //= 2
-    return res
+    layout = tree_layout(len(poly_list))
+    res = layout.new_tree(n)
+    res[layout.leaf_start : layout.leaf_start + len(poly_list)] = poly_list
+    return layout.fill_products(res)
 
 
 def recip_tree(prod_tree):
@@ -67,8 +139,8 @@ def recip_tree(prod_tree):
         gi_recip = r_tree[i]
         g1 = prod_tree[2 * i + 1]
         g2 = prod_tree[2 * i + 2]
-        d1 = len(g1.coeff) - 1
-        d2 = len(g2.coeff) - 1
+        d1 = len(g1) - 1
+        d2 = len(g2) - 1
         g1_recip = (gi_recip[d2:] * g2)[d2:]
         r_tree.append(g1_recip)
         g2_recip = (gi_recip[d1:] * g1)[d1:]
@@ -109,28 +181,174 @@ def remainder_tree(f, g_tree, g_recip_tree, n):
         else:
             f_mod_g = f_mod_g_tree[(i - 1) // 2]
         while True:
-            di = len(gi.coeff) - 1
+            di = len(gi) - 1
             hi = (f_mod_g[di:] * gi_recip)[di:]
             f_mod_gi = f_mod_g - gi * hi
-            if len(f_mod_gi.coeff) < len(gi.coeff) or (
-                len(f_mod_gi.coeff) == 1 and f_mod_gi.coeff[0] == 0
+            if len(f_mod_gi) < len(gi) or (
+                len(f_mod_gi) == 1 and f_mod_gi.coeff[0] == 0
             ):
                 break
             f_mod_g = f_mod_gi
         f_mod_g_tree.append(f_mod_gi)
     # assert len(g_recip_tree) == len(g_tree)
     # assert all(g_recip == g.recip() for g_recip, g in zip(g_recip_tree, g_tree))
-    k = len(f_mod_g_tree) + 1
-    for i in range(k // 2 - 1, k - 1):
-        f_mod_g_tree[i] = f_mod_g_tree[i].coeff[0]
-        if f_mod_g_tree[i] == 0:
-            f_mod_g_tree[i] = 1
-    k //= 2
-    while k > 1:
-        for i in range(k // 2 - 1, k - 1):
-            f_mod_g_tree[i] = f_mod_g_tree[2 * i + 1] * f_mod_g_tree[2 * i + 2] % n
-        k //= 2
-    return f_mod_g_tree
+    return _value_tree(f_mod_g_tree, n)
+
+
+def scaled_remainder_tree(f, g_tree, g_recip, n):
+    """Scaled Remainder Tree Algorithm (Bernstein). Computes the same tree as remainder_tree,
+    with one middle product per node in place of a division, and without a Recip Tree.
+
+    Node i holds the first deg(g_i) coefficients of the power series (f mod g_i) / g_i in 1/x,
+    as a polynomial y_i with the coefficient of x**(-1) at the top. The root holds the top
+    half of (f mod g) * recip(g), and for a node with children g_1 and g_2,
+    y_1 = y_i.middle_product(g_2) and y_2 = y_i.middle_product(g_1). At a leaf g_i = x - x_i,
+    y_i is the constant f(x_i).
+
+    Args:
+        f (Polynomial): Polynomial f.
+        g_tree (list(Polynomial)): Product Tree of polynomial [g_1, g_2, ..., g_m]. Each of g_i is
+            assumed to be of degree 1.
+        g_recip (Polynomial): The reciprocal polynomial of the root of g_tree.
+        n (int): Modulus.
+
+    Returns:
+        list(int): The Remainder Tree, as returned by remainder_tree.
+    """
+    d = len(g_tree[0]) - 1
+    f_mod_g = f.mod_with_recip(g_tree[0], g_recip).coeff
+    f_mod_g = Polynomial(f_mod_g + [0] * (d - len(f_mod_g)), n)
+    y_tree = [(f_mod_g * g_recip)[d : 2 * d]]
+    for i in range(len(g_tree) // 2):
+        y_tree.append(y_tree[i].middle_product(g_tree[2 * i + 2]))
+        y_tree.append(y_tree[i].middle_product(g_tree[2 * i + 1]))
+    return _value_tree(y_tree, n)
+
+
+def _value_tree(poly_tree, n):
+    # Replaces each leaf with its constant coefficient, or 1 when it is zero, and each internal
+    # node with the product of its children (mod n).
+    layout = tree_layout(len(poly_tree) // 2 + 1)
+    for i in range(layout.leaf_start, layout.size):
+        poly_tree[i] = poly_tree[i].coeff[0] if len(poly_tree[i]) > 0 else 0
+        if poly_tree[i] == 0:
+            poly_tree[i] = 1
+    for level in layout.levels:
+        for i in level:
+            poly_tree[i] = poly_tree[2 * i + 1] * poly_tree[2 * i + 2] % n
+    return poly_tree
+
+
+class Stage2Plan(object):
+    """Layout of stage2, which does not depend on the curve, built once per (b1, b2, wheel) by
+    stage2_plan.
+
+    Args:
+        b1 (int): Bound for primes used in step 1.
+        b2 (int): Bound for primes searched for in step 2. b1 < b2.
+        wheel (int): Wheel, where only numbers coprime to wheel will be considered.
+
+    Attributes:
+        j_list (list(int)): Numbers j in [1, wheel / 2) coprime to wheel. The roots of the
+            Product Tree are the x-coordinates of f(j) * Q, for the stage 1 point Q.
+        k_ls (list(int)): Multipliers of Q. f(j) for j in j_list, then the difference sequence
+            of f(c * wheel) from c = b1 // wheel.
+        blocks (list(int)): Number of polynomials x - x(f(c * wheel) * Q) of each block, whose
+            product is multiplied into H at once.
+        f_layout (TreeLayout): Shape of the Product Tree of the polynomials x - x(f(j) * Q),
+            with leaves in the order of j_list.
+        block_layouts (dict(int, TreeLayout)): Shape of the Product Tree of a block, by number
+            of polynomials.
+    """
+
+    def __init__(self, b1, b2, wheel):
+        super(Stage2Plan, self).__init__()
+        self.j_list = [j for j in range(1, wheel // 2) if gcd(j, wheel) == 1]
+        block_size = 1 << (len(self.j_list) - 1).bit_length() - 1
+        c1 = b1 // wheel
+        c2 = b2 // wheel + 2
+        self.k_ls = [
+            apply_polynomial(SUYAMA_POLYNOMIAL, j) for j in self.j_list
+        ] + get_difference_seq(SUYAMA_POLYNOMIAL, c1 * wheel, wheel)
+        self.blocks = [
+            min(block_size, c2 - c1 - c) for c in range(0, c2 - c1, block_size)
+        ]
+        self.f_layout = tree_layout(len(self.j_list))
+        self.block_layouts = {block: tree_layout(block) for block in set(self.blocks)}
+
+
+# (b1, b2, wheel) -> Stage2Plan
+_STAGE2_PLANS = dict()
+
+
+def stage2_plan(b1, b2, wheel):
+    """Layout of stage2, shared by all curves with the same bounds and wheel.
+
+    Args:
+        b1 (int): Bound for primes used in step 1.
+        b2 (int): Bound for primes searched for in step 2. b1 < b2.
+        wheel (int): Wheel, where only numbers coprime to wheel will be considered.
+
+    Returns:
+        Stage2Plan: Layout of stage2.
+    """
+    if (b1, b2, wheel) not in _STAGE2_PLANS:
+        _STAGE2_PLANS[b1, b2, wheel] = Stage2Plan(b1, b2, wheel)
+    return _STAGE2_PLANS[b1, b2, wheel]
+
+
+def stage2(pt, curve, b1, b2, wheel=2310):
+    """Standard continuation from b1 to b2 with Brent-Suyama's Extension and Polyeval, on a
+    point after stage 1. The layout, which does not depend on the curve, is cached by
+    stage2_plan.
+
+    Args:
+        pt (tuple(int, int)): Point after stage 1, in Montgomery form and XZ coordinates.
+        curve (tuple(int, int, int)): Curve in Montgomery form, as in ecm_montgomery.
+        b1 (int): Bound for primes used in step 1.
+        b2 (int): Bound for primes searched for in step 2. b1 < b2.
+        wheel (int, optional): Wheel, where only numbers coprime to wheel will be considered.
+            Defaults to 2310.
+
+    Raises:
+        InverseNotFound: Thrown when a point at infinity is met on the way.
+
+    Returns:
+        int: Non-trivial factor if found, otherwise returns None.
+    """
+    _A, _s, n = curve
+    plan = stage2_plan(b1, b2, wheel)
+    j_num = len(plan.j_list)
+    q, wst_curve = mnt.to_weierstrass(pt, curve)
+    mul_res = wst.mul_pt_multi(q, wst_curve, plan.k_ls)
+    cq_list = mul_res[j_num:]
+    # The curve fills in the leaves of the trees laid out by the plan.
+    f_layout = plan.f_layout
+    f_tree = f_layout.new_tree(n)
+    for i in range(j_num):
+        f_tree[f_layout.leaf_start + i] = Polynomial([n - mul_res[i][0], 1], n)
+    f_layout.fill_products(f_tree)
+    f_recip = f_tree[0].recip()
+    H = Polynomial([1], n)
+    for block in plan.blocks:
+        g_layout = plan.block_layouts[block]
+        g_tree = g_layout.new_tree(n)
+        for i in range(g_layout.leaf_start, g_layout.leaf_start + block):
+            g_tree[i] = Polynomial([n - cq_list[0][0], 1], n)
+            step_difference_seq_exn(cq_list, wst_curve)
+        G = g_layout.fill_products(g_tree)[0]
+        H = (H * G).mod_with_recip(f_tree[0], f_recip)
+    rem_tree = scaled_remainder_tree(H, f_tree, f_recip, n)
+    res = gcd(rem_tree[0], n)
+    if 1 < res < n:
+        return res
+    elif res == n:
+        for rem in rem_tree[f_layout.leaf_start : f_layout.leaf_start + j_num]:
+            res = gcd(rem, n)
+            if 1 < res < n:
+                return res
+        assert False
+    return None
 
 
 def ecm(n, rounds, b1, b2, wheel=2310, output=True):
@@ -160,76 +378,27 @@ def ecm(n, rounds, b1, b2, wheel=2310, output=True):
     """
     if n < 12:
         raise ValueError
-    j_list = [j for j in range(1, wheel // 2) if gcd(j, wheel) == 1]
-    block_size = 1 << (len(j_list) - 1).bit_length() - 1
     for round_i in range(rounds):
         if output:
             st = time.time()
             print("Round {}...".format(round_i))
-        count = 0
-        success = False
-        while not success and count < 20:
-            try:
-                count += 1
-                sigma = random.randint(6, n - 6)
-                mnt_pt, mnt_curve = mnt.get_curve_suyama(sigma, n)
-                success = True
-            except InverseNotFound as e:
-                res = gcd(e.x, n)
-                if 1 < res < n:
-                    return res
-            except CurveInitFail:
-                pass
-        if not success:
-            print(" - Curve Init Failed.")
-            break
         try:
             # Step 1
             if output:
                 print("{:>5.2f}: Step 1".format(time.time() - st))
-            for p in PRIME_GEN(b1):
-                for _ in range(int(np.log(b1) / np.log(p))):
-                    mnt_pt = mnt.mul_pt_exn(mnt_pt, mnt_curve, p)
+            mnt_pt, mnt_curve = mnt.get_curve_random(n)
+            mnt_pt = mnt.check(mnt.stage1(mnt_pt, mnt_curve, b1), mnt_curve)
             # Step 2
             if output:
                 print("{:>5.2f}: Step 2".format(time.time() - st))
-            polynomial = (2, 0, 9, 0, 6, 0, 1)  # f(x) = x^6 + 6x^4 + 9x^2 + 2
-            q, wst_curve = mnt.to_weierstrass(mnt_pt, mnt_curve)
-            c1 = b1 // wheel
-            c2 = b2 // wheel + 2
-            c = 0
-            k_ls = [
-                apply_polynomial(polynomial, j) for j in j_list
-            ] + get_difference_seq(polynomial, c1 * wheel, wheel)
-            mul_res = wst.mul_pt_multi(q, wst_curve, k_ls)
-            xj_list = []
-            for i in range(len(j_list)):
-                xj_list.append(mul_res[i][0])
-            cq_list = mul_res[len(j_list) :]
-            f_tree = product_tree([Polynomial([n - xj, 1], n) for xj in xj_list], n)
-            f_recip_tree = recip_tree(f_tree)
-            H = Polynomial([1], n)
-            g_poly_list = []
-            while c < c2 - c1:
-                for _ in range(min(block_size, c2 - c1 - c)):
-                    g_poly_list.append(Polynomial([n - cq_list[0][0], 1], n))
-                    step_difference_seq_exn(cq_list, wst_curve)
-                    c += 1
-                G = product_tree(g_poly_list, n)[0]
-                H = (H * G).mod_with_recip(f_tree[0], f_recip_tree[0])
-                g_poly_list.clear()
-            rem_tree = remainder_tree(H, f_tree, f_recip_tree, n)
-            res = gcd(rem_tree[0], n)
-            if 1 < res < n:
+            res = stage2(mnt_pt, mnt_curve, b1, b2, wheel)
+            if res is not None:
                 return res
-            elif res == n:
-                for rem in rem_tree[len(rem_tree) // 2 :]:
-                    res = gcd(rem, n)
-                    if 1 < res < n:
-                        return res
-                assert False
             if output:
                 print("{:>5.2f}: End".format(time.time() - st))
+        except CurveInitFail:
+            print(" - Curve Init Failed.")
+            break
         except InverseNotFound as e:
             res = gcd(e.x, n)
             if 1 < res < n:
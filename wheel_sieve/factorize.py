@@ -5,6 +5,7 @@ import random
 from wheel_sieve.miller_rabin import miller_rabin, witness_prime
 from wheel_sieve.common import PRIME_GEN, inv_power
 from wheel_sieve.ecm.ecm_polyeval import ecm
+import wheel_sieve.ecm.ecm_parallel as ecm_parallel
 
 
 def factor_small_primes(n, ubound):
@@ -51,7 +52,7 @@ def factor_power(n, ubound):
     return None, None
 
 
-def factor_ecm(n, ecm_kwargs_list, seed=None):
+def factor_ecm(n, ecm_kwargs_list, seed=None, workers=None):
     """Find a factor of a number n using ECM.
 
     Args:
@@ -59,11 +60,19 @@ def factor_ecm(n, ecm_kwargs_list, seed=None):
         ecm_kwargs_list (list(dict)): List of dicts containing keyword arguments to be passed to ecm
             call.
         seed (int, optional): Random seed to be set every ecm call. Defaults to None.
+        workers (int, optional): Number of worker processes trying curves in parallel, with
+            ecm_parallel.ecm. Defaults to None, trying curves one after another in the current
+            process.
 
     Returns:
         int: Factor, or None if not found.
     """
     for ecm_kwargs in ecm_kwargs_list:
+        if workers is not None:
+            factor = ecm_parallel.ecm(n, workers=workers, seed=seed, **ecm_kwargs)
+            if factor is not None:
+                return factor
+            continue
         if seed is not None:
             random.seed(seed)
         factor = ecm(n, **ecm_kwargs)
@@ -72,7 +81,7 @@ def factor_ecm(n, ecm_kwargs_list, seed=None):
     return None
 
 
-def factorize(n, witness=None):
+def factorize(n, witness=None, workers=None):
     """Factorize a number n, where n >= 2, with ECM into
     :math:`n = \\prod_{i} {p_i}^{d_{p_i}} * \\prod_{j} {f_j}^{d_{f_j}}`.
     Each :math:`p_i` passes the Miller Rabin Primality Test and is (probably) prime.
@@ -83,6 +92,8 @@ def factorize(n, witness=None):
         n (int): Integer to factorize.
         witness (list(int), optional): Witness to be used in Miller Rabin Primality Test.
             Defaults to witness_prime(100).
+        workers (int, optional): Number of worker processes trying ECM curves in parallel.
+            Defaults to None, trying curves in the current process.
 
     Raises:
         ValueError: Thrown when n < 2
@@ -152,7 +163,7 @@ def factorize(n, witness=None):
                     "output": False,
                 },
             ]
-            factor = factor_ecm(factor_i, ecm_kwargs_list, seed=2)
+            factor = factor_ecm(factor_i, ecm_kwargs_list, seed=2, workers=workers)
             if factor is not None:
                 working_dict[factor_i // factor] += power_i
                 working_dict[factor] += power_i
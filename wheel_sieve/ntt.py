@@ -0,0 +1,162 @@
+"""Integer multiplication with number theoretic transforms over numpy arrays.
+"""
+import numpy as np
+
+# Bits of the limbs the integers are split into
+LIMB_BITS = 16
+
+# Primes p = c * 2**k + 1 of the transforms, with a primitive root of each. Each limb of the
+# product is a sum of at most 2**26 products of two limbs, which is below the product of the
+# primes, so the sums are recovered exactly from their residues.
+NTT_PRIMES = (2013265921, 469762049)
+NTT_ROOTS = (31, 3)
+
+# Transforms are at most 2**MAX_LOG_SIZE long, as 2**26 divides p - 1 of all primes.
+MAX_LOG_SIZE = 26
+
+
+def multiply(x, y):
+    """Multiply non-negative integers x and y with number theoretic transforms.
+
+    The integers are split into limbs of LIMB_BITS bits, and their limbs are convolved with a
+    transform modulo each prime of NTT_PRIMES. The limbs of the product are recovered with the
+    Chinese remainder theorem, and carried with integer additions. Faster than the Karatsuba
+    multiplication of CPython for integers of about two million bits and more.
+
+    Args:
+        x (int): Multiplicand. x >= 0.
+        y (int): Multiplier. y >= 0. Squaring takes one transform less when y is x.
+
+    Raises:
+        ValueError: Thrown when the product is too long for the transforms.
+
+    Returns:
+        int: x * y.
+    """
+    if x == 0 or y == 0:
+        return 0
+    limb_bytes = LIMB_BITS // 8
+    x_limbs = _limbs(x)
+    y_limbs = x_limbs if y is x else _limbs(y)
+    size = len(x_limbs) + len(y_limbs) - 1
+    log_size = (size - 1).bit_length()
+    if log_size > MAX_LOG_SIZE:
+        raise ValueError
+    p, w_list, w_inv_list, size_inv = _tables(log_size)
+    x_hat = _forward(_pad(x_limbs, 1 << log_size), p, w_list)
+    if y is x:
+        prod_hat = x_hat * x_hat % p
+    else:
+        prod_hat = x_hat * _forward(_pad(y_limbs, 1 << log_size), p, w_list) % p
+    conv = _inverse(prod_hat, p, w_inv_list) * size_inv % p
+    # Chinese remainder theorem: c = r0 + p0 * ((r1 - r0) / p0 mod p1), below p0 * p1 < 2**64
+    p0, p1 = NTT_PRIMES
+    r0, r1 = conv[0, :size], conv[1, :size]
+    p0_inv = np.uint64(pow(p0, p1 - 2, p1))
+    t = (r1 + np.uint64(p1) - r0 % np.uint64(p1)) * p0_inv % np.uint64(p1)
+    conv = r0 + t * np.uint64(p0)
+    # Each sum of limb products is split into limbs, and the shifted limb sequences are added.
+    mask = np.uint64((1 << LIMB_BITS) - 1)
+    res = 0
+    for i in range(64 // LIMB_BITS):
+        part = (conv >> np.uint64(i * LIMB_BITS)) & mask
+        part_int = int.from_bytes(
+            part.astype("<u{}".format(limb_bytes)).tobytes(), byteorder="little"
+        )
+        res += part_int << (i * LIMB_BITS)
+    return res
+
+
+def _limbs(x):
+    # Limbs of x, least significant first, as np.uint64.
+    limb_bytes = LIMB_BITS // 8
+    length = ((x.bit_length() - 1) // LIMB_BITS + 1) * limb_bytes
+    return np.frombuffer(
+        x.to_bytes(length, byteorder="little"), dtype="<u{}".format(limb_bytes)
+    ).astype(np.uint64)
+
+
+def _pad(limbs, size):
+    # Limbs zero-padded to size, repeated for each prime.
+    res = np.zeros((len(NTT_PRIMES), size), dtype=np.uint64)
+    res[:, : len(limbs)] = limbs
+    return res
+
+
+# log_size -> (p, w_list, w_inv_list, size_inv)
+# p is the column of primes. w_list[s] holds the powers of a root of unity of order 2**(s+1)
+# for each prime, of shape (primes, 1, 2**s), and w_inv_list those of its inverse.
+_NTT_TABLES = dict()
+
+
+def _tables(log_size):
+    if log_size not in _NTT_TABLES:
+        size = 1 << log_size
+        p = np.array(NTT_PRIMES, dtype=np.uint64)[:, None]
+        w_rows, w_inv_rows = [], []
+        for prime, root in zip(NTT_PRIMES, NTT_ROOTS):
+            w = pow(root, (prime - 1) >> log_size, prime)
+            w_rows.append(_powers(w, size // 2, prime))
+            w_inv_rows.append(_powers(pow(w, prime - 2, prime), size // 2, prime))
+        w_all = np.array(w_rows, dtype=np.uint64)
+        w_inv_all = np.array(w_inv_rows, dtype=np.uint64)
+        w_list, w_inv_list = [], []
+        for s in range(log_size):
+            step = size >> (s + 1)
+            w_list.append(np.ascontiguousarray(w_all[:, None, ::step]))
+            w_inv_list.append(np.ascontiguousarray(w_inv_all[:, None, ::step]))
+        size_inv = np.array(
+            [pow(size, prime - 2, prime) for prime in NTT_PRIMES], dtype=np.uint64
+        )[:, None]
+        _NTT_TABLES[log_size] = (p, w_list, w_inv_list, size_inv)
+    return _NTT_TABLES[log_size]
+
+
+def _powers(w, count, prime):
+    # [w ** i % prime for i in range(count)], doubling the computed prefix at each step.
+    res = np.ones(max(count, 1), dtype=np.uint64)
+    length = 1
+    w_length = w
+    while length < count:
+        end = min(2 * length, count)
+        res[length:end] = res[: end - length] * np.uint64(w_length) % np.uint64(prime)
+        w_length = w_length * w_length % prime
+        length *= 2
+    return res[:count]
+
+
+def _forward(a, p, w_list):
+    # Decimation in frequency: natural order in, bit-reversed order out.
+    primes, size = a.shape
+    p3 = p[:, :, None]
+    half = size // 2
+    s = len(w_list) - 1
+    while half >= 1:
+        view = a.reshape(primes, -1, 2 * half)
+        u = view[:, :, :half]
+        v = view[:, :, half:]
+        diff = (u + p3 - v) * w_list[s] % p3
+        u += v
+        u %= p3
+        view[:, :, half:] = diff
+        half //= 2
+        s -= 1
+    return a
+
+
+def _inverse(a, p, w_inv_list):
+    # Decimation in time: bit-reversed order in, natural order out, without scaling.
+    primes, size = a.shape
+    p3 = p[:, :, None]
+    half = 1
+    s = 0
+    while half < size:
+        view = a.reshape(primes, -1, 2 * half)
+        u = view[:, :, :half]
+        v = view[:, :, half:] * w_inv_list[s] % p3
+        view[:, :, half:] = (u + p3 - v) % p3
+        u += v
+        u %= p3
+        half *= 2
+        s += 1
+    return a
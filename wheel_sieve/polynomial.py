@@ -1,21 +1,56 @@
 """Polynomial arithmetic (mod n).
 """
+import random
+import time
+import numpy as np
 from wheel_sieve.common import inv
+from wheel_sieve import ntt
+
+# Products of packed integers of at least NTT_BITS bits each are computed with ntt.multiply,
+# and smaller ones with the Karatsuba multiplication of CPython.
+NTT_BITS = 1 << 21
 
 
 class Polynomial(object):
     """Polynomial. f(x) = a0 + a1*x + a2*x**2 + ... + ad*x**d (mod n).
 
+    Products are held unreduced, as the slots of the packed product, and are reduced (mod n)
+    on first access. Slices of them stay unreduced, so the coefficients sliced off are never
+    reduced.
+
     Args:
-        coeff (list(int)): Coefficient list [a0, a1, a2, ..., ad].
+        coeff (list(int)): Coefficient list [a0, a1, a2, ..., ad], with 0 <= ai < n.
         n (int): Modulus.
         copy (bool, optional): Make a copy of the coefficient list. Defaults to False.
     """
 
     def __init__(self, coeff, n, copy=False):
-        self.coeff = coeff if not copy else coeff.copy()
+        self._coeff = coeff if not copy else coeff.copy()
+        self._slots = None
         self.n = n
 
+    @property
+    def coeff(self):
+        """list(int): Coefficient list [a0, a1, a2, ..., ad]."""
+        if self._slots is not None:
+            slot = self._slots.shape[1]
+            bt = self._slots.tobytes()
+            self._coeff = [
+                int.from_bytes(bt[i : i + slot], byteorder="little") % self.n
+                for i in range(0, len(bt), slot)
+            ]
+            self._slots = None
+        return self._coeff
+
+    @coeff.setter
+    def coeff(self, coeff):
+        self._coeff, self._slots = coeff, None
+
+    def __len__(self):
+        if self._slots is not None:
+            return len(self._slots)
+        return len(self._coeff)
+
     def __eq__(self, other):
         if not isinstance(other, Polynomial) or other.n != self.n:
             return False
@@ -32,6 +67,8 @@ class Polynomial(object):
         Returns:
             Polynomial: Polynomial with coefficient list as indexed/ sliced.
         """
+        if self._slots is not None and isinstance(slice_index, slice):
+            return _unreduced(self._slots[slice_index], self.n)
         return Polynomial(self.coeff[slice_index], self.n)
 
     def __str__(self):
@@ -76,9 +113,19 @@ class Polynomial(object):
             res.pop()
         return Polynomial(res, self.n)
 
+    def _packed(self, slot):
+        # Coefficients packed into an integer, in slots of slot bytes.
+        return int.from_bytes(
+            b"".join(ai.to_bytes(slot, byteorder="little") for ai in self.coeff),
+            byteorder="little",
+        )
+
     def __mul__(self, other):
         """Multiplies two polynomials self and other.
-        Relies on fast integer multiplication in Python implementation.
+        The coefficients are packed into integers (Kronecker substitution), which are
+        multiplied with the Karatsuba multiplication of CPython, or with ntt.multiply when
+        both have at least NTT_BITS bits. The product is returned unreduced, as a view of the
+        slots of the packed product.
 
         Args:
             other (Polynomial): Multiplier.
@@ -87,33 +134,42 @@ class Polynomial(object):
             ValueError: Thrown when other is not Polynomial or is incompatible.
 
         Returns:
-            Polynomial: self * other.
+            Polynomial: self * other, of len(self) + len(other) - 1 coefficients.
         """
         if not isinstance(other, Polynomial) or other.n != self.n:
             raise ValueError
-        d = max(len(self.coeff), len(other.coeff))
+        d = max(len(self), len(other))
         k = (d * self.n ** 2 + 1).bit_length()
         k_8 = (k - 1) // 8 + 1
         k = k_8 * 8
-        bt_self = bytes.join(
-            b"", (ai.to_bytes(k_8, byteorder="little") for ai in self.coeff)
-        )
-        t_self = int.from_bytes(bt_self, byteorder="little")
-        if self == other:
+        t_self = self._packed(k_8)
+        if other is self:
             t_other = t_self
         else:
-            bt_other = bytes.join(
-                b"", (ai.to_bytes(k_8, byteorder="little") for ai in other.coeff)
-            )
-            t_other = int.from_bytes(bt_other, byteorder="little")
-        t_res = t_self * t_other
-        res = []
-        bt_res = t_res.to_bytes((t_res.bit_length() - 1) // 8 + 1, byteorder="little")
-        i = 0
-        while i < len(bt_res):
-            res.append(int.from_bytes(bt_res[i : i + k_8], byteorder="little") % self.n)
-            i += k_8
-        return Polynomial(res, self.n)
+            t_other = other._packed(k_8)
+        if min(t_self.bit_length(), t_other.bit_length()) >= NTT_BITS:
+            t_res = ntt.multiply(t_self, t_other)
+        else:
+            t_res = t_self * t_other
+        return _unreduced(_unpacked(t_res, len(self) + len(other) - 1, k_8), self.n)
+
+    def middle_product(self, other):
+        """Middle product of self and other. For self of length la and other of length lb,
+        these are the coefficients of x**(lb-1) to x**(la-1) of self * other, the ones each
+        coefficient of other contributes to. Only these coefficients are reduced.
+
+        Args:
+            other (Polynomial): Multiplier.
+
+        Raises:
+            ValueError: Thrown when other is not Polynomial or is incompatible.
+
+        Returns:
+            Polynomial: Middle product, of max(la - lb + 1, 0) coefficients.
+        """
+        if not isinstance(other, Polynomial) or other.n != self.n:
+            raise ValueError
+        return (self * other)[len(other) - 1 : len(self)]
 
     def __divmod__(self, other):
         """Divides polynomials self by other, return quotient and remainder.
@@ -129,8 +185,8 @@ class Polynomial(object):
         """
         if not isinstance(other, Polynomial) or other.n != self.n:
             raise ValueError
-        pn = len(self.coeff)
-        qn = len(other.coeff)
+        pn = len(self)
+        qn = len(other)
         if pn < qn:
             poly_quo = Polynomial([0], self.n)
             poly_rem = Polynomial(self.coeff, self.n, copy=True)
@@ -143,9 +199,7 @@ class Polynomial(object):
                 quo = (dividend[d:] * other_recip)[d:]
                 poly_quo += quo
                 rem = dividend - quo * other
-                if len(rem.coeff) < len(other.coeff) or (
-                    len(rem.coeff) == 1 and rem.coeff[0] == 0
-                ):
+                if len(rem) < len(other) or (len(rem) == 1 and rem.coeff[0] == 0):
                     break
                 dividend = rem
             poly_rem = rem
@@ -166,8 +220,8 @@ class Polynomial(object):
         """
         if not isinstance(other, Polynomial) or other.n != self.n:
             raise ValueError
-        pn = len(self.coeff)
-        qn = len(other.coeff)
+        pn = len(self)
+        qn = len(other)
         if pn < qn:
             poly_rem = Polynomial(self.coeff, self.n, copy=True)
         else:
@@ -176,9 +230,7 @@ class Polynomial(object):
             while True:
                 quo = (dividend[d:] * other_recip)[d:]
                 rem = dividend - quo * other
-                if len(rem.coeff) < len(other.coeff) or (
-                    len(rem.coeff) == 1 and rem.coeff[0] == 0
-                ):
+                if len(rem) < len(other) or (len(rem) == 1 and rem.coeff[0] == 0):
                     break
                 dividend = rem
             poly_rem = rem
@@ -202,11 +254,13 @@ class Polynomial(object):
             H = (R_prev * R_prev) * Polynomial(
                 [self.coeff[d - k + j + 1] for j in range(k)], self.n
             )
+            # Only the coefficients k - 3 to 2k - 3 of H are used, and only these are reduced.
+            H_high = H[k - 2 :].coeff
             R_curr_coeff = [0 for _ in range(k // 2)]
             for ai in R_prev.coeff:
                 R_curr_coeff.append(2 * ai)
             for j in range(k):
-                R_curr_coeff[j] = (R_curr_coeff[j] - H.coeff[j + k - 2]) % self.n
+                R_curr_coeff[j] = (R_curr_coeff[j] - H_high[j]) % self.n
             R_curr = Polynomial(R_curr_coeff, self.n)
             e_prev = e_curr
             if k == 2:
@@ -214,13 +268,48 @@ class Polynomial(object):
             elif k <= d:
                 e_curr = (
                     e_prev * e_prev
-                    - H.coeff[k - 3] * self.coeff[d]
+                    - H[k - 3 : k - 2].coeff[0] * self.coeff[d]
                     - self.coeff[d - k] * inv_fn
                 ) % self.n
             k *= 2
-        res = R_curr
+        res = R_curr.coeff
         if k == d * 2:
             # Only needed when k is a power of 2.
-            res.coeff.insert(0, e_curr * inv_fn % self.n)
-        res.coeff = res.coeff[-d - 1 :]
-        return res
+            res = [e_curr * inv_fn % self.n] + res
+        return Polynomial(res[-d - 1 :], self.n)
+
+
+def _unreduced(slots, n):
+    # Polynomial with coefficients (mod n) held unreduced in the rows of slots, an np.uint8
+    # array of little-endian integers.
+    res = Polynomial([], n)
+    res._coeff, res._slots = None, slots
+    return res
+
+
+def _unpacked(t, size, slot):
+    # Slots of integer t as an np.uint8 array of shape (size, slot).
+    bt = t.to_bytes(size * slot, byteorder="little")
+    return np.frombuffer(bt, dtype=np.uint8).reshape(size, slot)
+
+
+if __name__ == "__main__":
+    random.seed(2)
+    modulus = 294636370796972331405770334382449402989049465216208991677129
+    for degree in (256, 1024, 4096, 16384):
+        f = Polynomial([random.randrange(modulus) for _ in range(degree + 1)], modulus)
+        g = Polynomial([random.randrange(modulus) for _ in range(degree + 1)], modulus)
+        times = []
+        for ntt_bits in (float("inf"), 0):
+            NTT_BITS = ntt_bits
+            # Warm up the tables of the transforms.
+            res = f * g
+            st = time.time()
+            res = f * g
+            times.append(time.time() - st)
+        NTT_BITS = 1 << 21
+        print(
+            "degree {:>5}: packing {:.3f}s, ntt {:.3f}s".format(
+                degree, times[0], times[1]
+            )
+        )
@@ -0,0 +1,178 @@
+"""Bitset of primes in a range, packed on a wheel.
+"""
+import time
+import numpy as np
+from wheel_sieve.wheel_sieve_byte import (
+    MEM,
+    PRIME_GEN,
+    SegmentedSieve,
+    split_segments,
+    wheel_table,
+)
+
+# Number of set bits of each byte
+POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class PrimeBitset(object):
+    """Primes in [lbound, ubound), sieved into a bitset packed on the wheel of p_list.
+
+    Row r holds the numbers (base + r) * wheel + k_list[i], where base = lbound // wheel.
+    Bit i % 8 of byte [r, i // 8] is set when the number is prime. Wheel primes in range are
+    kept in a separate list, as they have no column.
+
+    Args:
+        lbound (int): lower bound of range.
+        ubound (int): upper bound of range.
+        p_list (tuple, optional): wheel primes. Defaults to (2, 3, 5, 7, 11).
+        mem (int, optional): memory (bytes) of the sieving array of a segment.
+            Defaults to None, using MEM.
+
+    Raises:
+        ValueError: Thrown when input is bad.
+    """
+
+    def __init__(self, lbound, ubound, p_list=(2, 3, 5, 7, 11), mem=None):
+        super(PrimeBitset, self).__init__()
+        if (
+            not isinstance(lbound, int)
+            or not isinstance(ubound, int)
+            or not 1 <= lbound <= ubound
+        ):
+            raise ValueError
+        if not all(isinstance(x, int) and x > 1 for x in p_list):
+            raise ValueError
+        if mem is None:
+            mem = MEM
+        elif not isinstance(mem, int) or mem < 1:
+            raise ValueError
+        PRIME_GEN.set_n(int(np.sqrt(ubound)) + 1)
+        self.lbound = lbound
+        self.ubound = ubound
+        self.table = table = wheel_table(p_list)
+        self.wheel = wheel = table.wheel
+        self.base = lbound // wheel
+        self.wheel_primes = [
+            prime
+            for prime in PRIME_GEN(min(max(p_list) + 1, ubound))
+            if lbound <= prime and wheel % prime == 0
+        ]
+        # Segments end on multiples of wheel, so that their rows follow each other.
+        step_size = max(1, mem // len(table.k_list)) * wheel
+        sieve = SegmentedSieve(lbound, ubound, table, step_size // wheel)
+        self.bits = np.concatenate(
+            [np.zeros((0, (len(table.k_list) + 7) // 8), dtype=np.uint8)]
+            + [
+                np.packbits(sieve.sieve(curr), axis=1, bitorder="little")
+                for _prev, curr in split_segments(lbound, ubound, step_size, wheel)
+            ]
+        )
+        # row_counts[r]: number of primes in rows before r, excluding wheel primes
+        self.row_counts = np.zeros(len(self.bits) + 1, dtype=np.int64)
+        np.cumsum(POPCOUNT8[self.bits].sum(axis=1), out=self.row_counts[1:])
+
+    def __len__(self):
+        return len(self.wheel_primes) + int(self.row_counts[-1])
+
+    def __iter__(self):
+        yield from self.wheel_primes
+        for row in range(0, len(self.bits), 4096):
+            yield from self._row_primes(row, row + 4096).tolist()
+
+    def primes(self):
+        """Primes in the range.
+
+        Returns:
+            np.array: primes in ascending order, of dtype np.uint64.
+        """
+        return np.concatenate(
+            (
+                np.array(self.wheel_primes, dtype=np.uint64),
+                self._row_primes(0, len(self.bits)),
+            )
+        )
+
+    def is_prime(self, x):
+        """Whether x is prime. Numbers outside of the range are reported as not prime.
+
+        Args:
+            x (int or np.array): number, or np.int64 array of numbers.
+
+        Returns:
+            bool or np.array: whether x is prime, as bool array when x is an array.
+        """
+        if not isinstance(x, np.ndarray):
+            return bool(self.is_prime(np.array([x], dtype=np.int64))[0])
+        x = x.astype(np.int64, copy=False)
+        res = np.isin(x, self.wheel_primes)
+        row = x // self.wheel - self.base
+        column = self.table.k_index[x % self.wheel]
+        valid = (self.lbound <= x) & (x < self.ubound) & (column >= 0)
+        row, column = row[valid], column[valid]
+        res[valid] = (self.bits[row, column // 8] >> (column % 8).astype(np.uint8)) & 1
+        return res
+
+    def rank(self, x):
+        """Number of primes in [lbound, x], like pi(x) - pi(lbound - 1).
+
+        Args:
+            x (int): number.
+
+        Returns:
+            int: number of primes.
+        """
+        res = sum(1 for prime in self.wheel_primes if prime <= x)
+        if x < self.lbound:
+            return 0
+        if x >= self.ubound:
+            return len(self)
+        row = x // self.wheel - self.base
+        # Columns of numbers <= x in the row
+        columns = int(np.searchsorted(self.table.k_array, x % self.wheel, side="right"))
+        res += int(self.row_counts[row])
+        res += int(POPCOUNT8[self.bits[row, : columns // 8]].sum())
+        if columns % 8 != 0:
+            mask = (1 << (columns % 8)) - 1
+            res += int(POPCOUNT8[self.bits[row, columns // 8] & mask])
+        return res
+
+    def select(self, i):
+        """The i-th prime of the range, counting from 0.
+
+        Args:
+            i (int): index.
+
+        Raises:
+            IndexError: Thrown when i is out of range.
+
+        Returns:
+            int: prime.
+        """
+        if not 0 <= i < len(self):
+            raise IndexError
+        if i < len(self.wheel_primes):
+            return self.wheel_primes[i]
+        i -= len(self.wheel_primes)
+        row = int(np.searchsorted(self.row_counts, i, side="right")) - 1
+        return int(self._row_primes(row, row + 1)[i - self.row_counts[row]])
+
+    def _row_primes(self, start, end):
+        # Primes in rows [start, end), in ascending order.
+        rows, columns = np.nonzero(
+            np.unpackbits(self.bits[start:end], axis=1, bitorder="little")
+        )
+        primes = (rows + (self.base + start)).astype(np.uint64) * np.uint64(self.wheel)
+        primes += self.table.k_array[columns].astype(np.uint64)
+        return primes
+
+
+if __name__ == "__main__":
+    st = time.time()
+    bitset = PrimeBitset(1, 1_000_000_000)
+    print(
+        "{} primes, {} bytes, {:.2f}s".format(
+            len(bitset), bitset.bits.nbytes, time.time() - st
+        )
+    )
+    st = time.time()
+    print(bitset.rank(999_999_999), bitset.select(50_847_533), time.time() - st)
@@ -0,0 +1,154 @@
+"""Prime counting function with Meissel's formula.
+"""
+import time
+import numpy as np
+from wheel_sieve.wheel_sieve_byte import (
+    MEM,
+    PRIME_GEN,
+    SegmentedSieve,
+    split_segments,
+    wheel_sieve_count,
+    wheel_table,
+)
+
+# Below this bound, primes are counted with the wheel sieve directly.
+SIEVE_BOUND = 10_000_000
+
+# phi(v, b) for b <= PHI_PRIMES is read from a table of one period of the primorial.
+PHI_PRIMES = 7
+
+
+def prime_pi(x, mem=None):
+    """Count primes <= x with Meissel's formula.
+
+    With a = pi(x^(1/3)) and b = pi(x^(1/2)),
+    pi(x) = phi(x, a) + a - 1 - sum(pi(x / p_i) - i + 1 for a < i <= b),
+    where phi(v, a) counts numbers in [1, v] not divisible by the first a primes.
+    phi(x, a) is expanded with phi(v, b) = phi(v, b - 1) - phi(v / p_b, b - 1), merging equal
+    arguments of each level, until v < p_(b+1)^2 where phi(v, b) = 1 + pi(v) - b, or down to
+    PHI_PRIMES primes. All pi(v) needed are below x^(2/3), and are counted in one pass of the
+    segmented wheel sieve.
+
+    Args:
+        x (int): upper bound, inclusive.
+        mem (int, optional): memory (bytes) of the sieving array of a segment.
+            Defaults to None, using MEM.
+
+    Raises:
+        ValueError: Thrown when input is bad.
+
+    Returns:
+        int: number of primes <= x.
+    """
+    if not isinstance(x, int) or x < 0:
+        raise ValueError
+    if mem is None:
+        mem = MEM
+    elif not isinstance(mem, int) or mem < 1:
+        raise ValueError
+    if x < SIEVE_BOUND:
+        return wheel_sieve_count(1, x + 1, mem=mem)
+    y = _iroot(x, 3)
+    primes = PRIME_GEN.primes_below(_iroot(x, 2) + 1).astype(np.int64)
+    a = int(np.searchsorted(primes, y, side="right"))
+    b = len(primes)
+    phi_table, phi_points, phi_levels, phi_coefs = _phi(x, a, primes)
+    # Points of pi(v): leaves of phi, then x / p_i for a < i <= b
+    points = np.concatenate((phi_points, x // primes[a:]))
+    order = np.argsort(points)
+    pi_points = np.empty_like(points)
+    pi_points[order] = _prime_pi_at(points[order], mem)
+    pi_leaves = pi_points[: len(phi_points)]
+    phi_x = phi_table + int((phi_coefs * (1 + pi_leaves - phi_levels)).sum())
+    p2 = int(pi_points[len(phi_points) :].sum()) - (b - a) * (a + b - 1) // 2
+    return phi_x + a - 1 - p2
+
+
+def _phi(x, a, primes):
+    # Expand phi(x, a) into sum(coefs * phi(points, levels)), with points v < p_(level+1)^2,
+    # plus the sum of the leaves at level PHI_PRIMES, which is returned as phi_table.
+    # Each level is a sorted array of distinct arguments with nonzero coefficients.
+    wheel = 1
+    for prime in primes[:PHI_PRIMES].tolist():
+        wheel *= prime
+    coprime = np.ones(wheel, dtype=bool)
+    for prime in primes[:PHI_PRIMES].tolist():
+        coprime[::prime] = False
+    phi_wheel = np.cumsum(coprime)
+    squares = primes * primes
+    v = np.array([x], dtype=np.int64)
+    coef = np.array([1], dtype=np.int64)
+    points_list, levels_list, coefs_list = [], [], []
+    for level in range(a, PHI_PRIMES, -1):
+        leaf = v < squares[level]
+        points_list.append(v[leaf])
+        levels_list.append(np.full(np.count_nonzero(leaf), level, dtype=np.int64))
+        coefs_list.append(coef[leaf])
+        v, coef = v[~leaf], coef[~leaf]
+        # Both halves are sorted, so the stable sort merges two runs.
+        v = np.concatenate((v, v // primes[level - 1]))
+        coef = np.concatenate((coef, -coef))
+        order = np.argsort(v, kind="stable")
+        v, coef = v[order], coef[order]
+        starts = np.flatnonzero(np.r_[True, v[1:] != v[:-1]])
+        coef = np.add.reduceat(coef, starts) if len(v) > 0 else coef
+        v = v[starts]
+        v, coef = v[coef != 0], coef[coef != 0]
+    phi_table = int(
+        (coef * (v // wheel * int(phi_wheel[-1]) + phi_wheel[v % wheel])).sum()
+    )
+    return (
+        phi_table,
+        np.concatenate([np.zeros(0, dtype=np.int64)] + points_list),
+        np.concatenate([np.zeros(0, dtype=np.int64)] + levels_list),
+        np.concatenate([np.zeros(0, dtype=np.int64)] + coefs_list),
+    )
+
+
+def _prime_pi_at(points, mem):
+    # pi(v) for each v of a sorted np.int64 array, in one pass of the segmented wheel sieve.
+    # In a sieved segment, entries in row-major order are in ascending order of numbers, so
+    # pi(v) is the count of previous segments plus a prefix sum of the segment.
+    table = wheel_table((2, 3, 5))
+    wheel, k_num = table.wheel, len(table.k_list)
+    # k_count[r]: number of k in k_list with k <= r
+    k_count = np.searchsorted(table.k_array, np.arange(wheel), side="right")
+    pi_points = np.searchsorted(np.array(table.p_list), points, side="right")
+    ubound = int(points[-1]) + 1 if len(points) > 0 else 1
+    PRIME_GEN.set_n(int(np.sqrt(ubound)) + 1)
+    step_size = max(1, mem // k_num) * wheel
+    sieve = SegmentedSieve(1, ubound, table, step_size // wheel)
+    count = 0
+    lo = 0
+    for prev, curr in split_segments(1, ubound, step_size, wheel):
+        c_array = sieve.sieve(curr)
+        hi = int(np.searchsorted(points, curr))
+        if hi > lo:
+            cum = np.cumsum(c_array.ravel(), dtype=np.int64)
+            cum = np.r_[0, cum]
+            q = points[lo:hi]
+            pos = (q // wheel - prev // wheel) * k_num + k_count[q % wheel]
+            pi_points[lo:hi] += count + cum[pos]
+        count += int(np.count_nonzero(c_array))
+        lo = hi
+    return pi_points
+
+
+def _iroot(x, d):
+    # Integer d-th root of x.
+    r = int(round(x ** (1 / d)))
+    while r ** d > x:
+        r -= 1
+    while (r + 1) ** d <= x:
+        r += 1
+    return r
+
+
+if __name__ == "__main__":
+    for n in (10 ** 10, 10 ** 11, 10 ** 12, 10 ** 13):
+        st = time.time()
+        res = prime_pi(n)
+        print("pi({:.0e}) = {}, {:.2f}s".format(n, res, time.time() - st))
+    st = time.time()
+    res = wheel_sieve_count(1, 10 ** 10 + 1)
+    print("wheel_sieve_count(1, 1e10 + 1) = {}, {:.2f}s".format(res, time.time() - st))
@@ -0,0 +1,132 @@
+"""Calibration of the segment size and wheel of the wheel sieves, cached on disk.
+
+Example:
+    wheel_sieve_count(1, 1_000_000_000, **tuned_params())
+"""
+import json
+import os
+import platform
+import tempfile
+import time
+import wheel_sieve.wheel_sieve_bit as bit
+import wheel_sieve.wheel_sieve_byte as byte
+
+# Candidate memory (bytes) of the sieving array of a segment
+MEM_LIST = (1 << 16, 1 << 18, 1 << 20, 1 << 21, 1 << 23)
+
+# Candidate wheel primes
+P_LIST_LIST = ((2, 3, 5), (2, 3, 5, 7))
+
+# Calibration cache, unless overridden by environment variable WHEEL_SIEVE_TUNING
+CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "wheel_sieve", "tuning.json"
+)
+
+# Sieve name -> (count function, rows of a segment per byte of mem and column)
+SIEVES = {
+    "byte": (byte.wheel_sieve_count, 1),
+    "bit": (bit.wheel_sieve_count, 8),
+}
+
+
+def calibrate(
+    sieve="byte",
+    lbound=10_000_000_000,
+    segments=2,
+    mem_list=MEM_LIST,
+    p_list_list=P_LIST_LIST,
+):
+    """Time a few segments of a sieve for each segment size and wheel, and pick the fastest.
+
+    Args:
+        sieve (str, optional): "byte" or "bit". Defaults to "byte".
+        lbound (int, optional): lower bound of the timed ranges. Defaults to 10_000_000_000.
+        segments (int, optional): number of segments timed. Defaults to 2.
+        mem_list (tuple(int), optional): candidate segment sizes. Defaults to MEM_LIST.
+        p_list_list (tuple(tuple(int)), optional): candidate wheel primes.
+            Defaults to P_LIST_LIST.
+
+    Raises:
+        ValueError: Thrown when sieve is unknown.
+
+    Returns:
+        dict: keyword arguments mem and p_list of the fastest setting.
+    """
+    if sieve not in SIEVES:
+        raise ValueError
+    func, bits = SIEVES[sieve]
+    best = None
+    for p_list in p_list_list:
+        table = byte.wheel_table(p_list)
+        wheel, k_list = table.wheel, table.k_list
+        for mem in mem_list:
+            span = segments * max(1, mem // len(k_list)) * wheel * bits
+            # Warm up the sieving primes and the presieve pattern.
+            func(lbound + span - 1, lbound + span, p_list)
+            st = time.perf_counter()
+            func(lbound, lbound + span, p_list, mem=mem)
+            rate = (time.perf_counter() - st) / span
+            if best is None or rate < best[0]:
+                best = rate, {"mem": mem, "p_list": p_list}
+    return best[1]
+
+
+def tuned_params(sieve="byte", path=None, recalibrate=False):
+    """Keyword arguments mem and p_list for a sieve on this host. They are calibrated on
+    first use and cached on disk.
+
+    Args:
+        sieve (str, optional): "byte" or "bit". Defaults to "byte".
+        path (str, optional): path of the cache. Defaults to None, using environment variable
+            WHEEL_SIEVE_TUNING if set, or CACHE_PATH.
+        recalibrate (bool, optional): calibrate even when cached. Defaults to False.
+
+    Raises:
+        ValueError: Thrown when sieve is unknown.
+
+    Returns:
+        dict: keyword arguments mem and p_list.
+    """
+    if sieve not in SIEVES:
+        raise ValueError
+    if path is None:
+        path = os.environ.get("WHEEL_SIEVE_TUNING", CACHE_PATH)
+    key = "{}/{}/{}".format(platform.node(), platform.machine(), sieve)
+    cache = _load(path)
+    if recalibrate or key not in cache:
+        cache[key] = calibrate(sieve)
+        _save(path, cache)
+    return {"mem": int(cache[key]["mem"]), "p_list": tuple(cache[key]["p_list"])}
+
+
+def _load(path):
+    try:
+        with open(path, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return dict()
+    return cache if isinstance(cache, dict) else dict()
+
+
+def _save(path, cache):
+    # Replace the cache atomically, so that concurrent readers never see a partial file.
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+if __name__ == "__main__":
+    for name in SIEVES:
+        st = time.time()
+        params = tuned_params(name, recalibrate=True)
+        print("{:>4}: {}, calibrated in {:.2f}s".format(name, params, time.time() - st))
+        st = time.time()
+        res = SIEVES[name][0](1, 1_000_000_000, **params)
+        print("{:>4} 1e+09: {} primes, {:.2f}s".format(name, res, time.time() - st))
@@ -1,19 +1,31 @@
 """Prime sieve with wheel factorization. Uses bitarray.
 """
+import time
 import numpy as np
-from wheel_sieve.wheel_sieve_byte import PRIME_GEN
+import wheel_sieve.wheel_sieve_byte as byte
 
 # Memory (bytes) used in sieving numpy array
 MEM = 8_000_000
 
+# Primes below WORD_BITS are struck with precomputed word patterns.
+WORD_BITS = 64
 
-def wheel_sieve_count(lbound, ubound, p_list=(2, 3, 5)):
+# Primes hitting fewer than SLICE_HITS bytes per strided slice are struck with fancy indexing.
+SLICE_HITS = 512
+
+# Primes hitting a bucket fewer than BUCKET_HITS times per column are bucket sieved.
+BUCKET_HITS = 32
+
+
+def wheel_sieve_count(lbound, ubound, p_list=(2, 3, 5), mem=None):
     """Count primes in [lbound, ubound) using wheel sieve.
 
     Args:
         lbound (int): lower bound of range.
         ubound (int): upper bound of range.
         p_list (tuple, optional): wheel primes. Defaults to (2, 3, 5).
+        mem (int, optional): memory (bytes) of the sieving array of a segment.
+            Defaults to None, using MEM.
 
     Raises:
         ValueError: Thrown when input is bad.
@@ -29,117 +41,223 @@ def wheel_sieve_count(lbound, ubound, p_list=(2, 3, 5)):
         raise ValueError
     if not all(isinstance(x, int) and x > 1 for x in p_list):
         raise ValueError
-    PRIME_GEN.set_n(int(np.sqrt(ubound)) + 1)
-    # wheel : product of primes in p_list
-    # k_list : numbers from 1 to wheel coprime to wheel
-    # kl_list : multiplication table of k_list mod wheel
-    wheel = 1
-    for wheel_prime in p_list:
-        wheel *= wheel_prime
-    k_list = [
-        k
-        for k in range(1, wheel)
-        if all(k % wheel_prime != 0 for wheel_prime in p_list)
-    ]
-    kl_list = {k: [k_list.index(k * l % wheel) for l in k_list] for k in k_list}
+    if mem is None:
+        mem = MEM
+    elif not isinstance(mem, int) or mem < 1:
+        raise ValueError
+    byte.PRIME_GEN.set_n(int(np.sqrt(ubound)) + 1)
+    table = byte.wheel_table(p_list)
+    wheel, k_list = table.wheel, table.k_list
     # Count primes between lbound and max(p_list)
     count = 0
     if lbound <= max(p_list):
-        for wheel_prime in PRIME_GEN(max(p_list) + 1):
+        for wheel_prime in byte.PRIME_GEN(min(max(p_list) + 1, ubound)):
             if lbound <= wheel_prime and wheel % wheel_prime == 0:
                 count += 1
-
-    # Split into smaller partitions to reduce memory usage
-    step_size = max(1, MEM // len(k_list)) * wheel * 8
-    prev = lbound
-    while prev < ubound:
-        curr = ((prev + step_size - 1) // (wheel * 8) + 1) * wheel * 8
-        curr = min(curr, ubound)
-        res = _wheel_sieve_bit(prev, curr, wheel, k_list, kl_list)
-        count += np.sum(np.bincount(np.ndarray.flatten(res), minlength=256) * BIT_COUNT)
-        prev = curr
+    # Split into smaller partitions to reduce memory usage.
+    # Segments end on multiples of wheel * WORD_BITS, so that words are aligned to rows.
+    step_size = max(1, mem // len(k_list)) * wheel * 8
+    sieve = SegmentedSieveBit(lbound, ubound, table, step_size // wheel)
+    segments = byte.split_segments(lbound, ubound, step_size, wheel * WORD_BITS)
+    for _prev, curr in segments:
+        count += popcount(sieve.sieve(curr))
     return count
 
 
-CLEAR_BIT = (
-    np.uint8(~(1 << 7)),
-    np.uint8(~(1 << 6)),
-    np.uint8(~(1 << 5)),
-    np.uint8(~(1 << 4)),
-    np.uint8(~(1 << 3)),
-    np.uint8(~(1 << 2)),
-    np.uint8(~(1 << 1)),
-    np.uint8(~(1 << 0)),
-)
-
-CLEAR_BIT_FROM = (
-    np.uint8(-1 << 8),
-    np.uint8(-1 << 7),
-    np.uint8(-1 << 6),
-    np.uint8(-1 << 5),
-    np.uint8(-1 << 4),
-    np.uint8(-1 << 3),
-    np.uint8(-1 << 2),
-    np.uint8(-1 << 1),
-)
-
-# [sum(c == "1" for c in "{:>08}".format(bin(np.uint8(x))[2:])) for x in range(256)]
-
-# fmt: off
-BIT_COUNT = np.array([
-    0, 1, 1, 2, 1, 2, 2, 3, 1, 2, 2, 3, 2, 3, 3, 4,
-    1, 2, 2, 3, 2, 3, 3, 4, 2, 3, 3, 4, 3, 4, 4, 5,
-    1, 2, 2, 3, 2, 3, 3, 4, 2, 3, 3, 4, 3, 4, 4, 5,
-    2, 3, 3, 4, 3, 4, 4, 5, 3, 4, 4, 5, 4, 5, 5, 6,
-    1, 2, 2, 3, 2, 3, 3, 4, 2, 3, 3, 4, 3, 4, 4, 5,
-    2, 3, 3, 4, 3, 4, 4, 5, 3, 4, 4, 5, 4, 5, 5, 6,
-    2, 3, 3, 4, 3, 4, 4, 5, 3, 4, 4, 5, 4, 5, 5, 6,
-    3, 4, 4, 5, 4, 5, 5, 6, 4, 5, 5, 6, 5, 6, 6, 7,
-    1, 2, 2, 3, 2, 3, 3, 4, 2, 3, 3, 4, 3, 4, 4, 5,
-    2, 3, 3, 4, 3, 4, 4, 5, 3, 4, 4, 5, 4, 5, 5, 6,
-    2, 3, 3, 4, 3, 4, 4, 5, 3, 4, 4, 5, 4, 5, 5, 6,
-    3, 4, 4, 5, 4, 5, 5, 6, 4, 5, 5, 6, 5, 6, 6, 7,
-    2, 3, 3, 4, 3, 4, 4, 5, 3, 4, 4, 5, 4, 5, 5, 6,
-    3, 4, 4, 5, 4, 5, 5, 6, 4, 5, 5, 6, 5, 6, 6, 7,
-    3, 4, 4, 5, 4, 5, 5, 6, 4, 5, 5, 6, 5, 6, 6, 7,
-    4, 5, 5, 6, 5, 6, 6, 7, 5, 6, 6, 7, 6, 7, 7, 8
-])
-# fmt: on
-
-
-def _wheel_sieve_bit(lbound, ubound, wheel, k_list, kl_list):
-    # Ignore numbers outside of range [lbound, ubound)
-    am = lbound // wheel
-    bm = (ubound - 2) // wheel + 1
-    q, r = divmod(bm - am, 8)
-    if r != 0:
-        q += 1
-    c_array = ~np.zeros((q, len(k_list)), dtype=np.uint8)
-    for i, k in enumerate(k_list):
-        if am * wheel + k < lbound or am * wheel + k == 1:
-            c_array[0, i] &= CLEAR_BIT[0]
-        if (bm - 1) * wheel + k >= ubound:
-            c_array[-1, i] &= CLEAR_BIT_FROM[r - 1]
-        elif r != 0:
-            c_array[-1, i] &= CLEAR_BIT_FROM[r]
-    # Sieve
-    for prime in PRIME_GEN(int(np.sqrt(ubound)) + 1):
-        if wheel % prime == 0:
-            continue
-        km = max(prime // wheel, am // prime)
-        kp_list = kl_list[prime % wheel]
-        for k, idx in zip(k_list, kp_list):
-            nm = prime * km + prime * k // wheel - am
-            if nm < 0 or (km == 0 and k == 1):
-                nm += prime
-            for _ in range(8):
-                qi, ri = divmod(nm, 8)
-                if qi > q:
-                    break
-                c_array[qi::prime, idx] &= CLEAR_BIT[ri]
-                nm += prime
-    return c_array
+class SegmentedSieveBit(byte.SegmentedSieve):
+    """Stateful segmented wheel sieve on [lbound, ubound), storing one bit per number.
+
+    Each column of the wheel is a little-endian bit array of np.uint64 words: bit b of word w
+    is for row base + WORD_BITS * w + b, where base is the row of lbound rounded down to a
+    multiple of WORD_BITS. Each segment starts as a copy of the presieve pattern. Primes below
+    WORD_BITS are struck a word at a time with periodic patterns, the rest on the bytes of
+    each column.
+
+    Args:
+        lbound (int): lower bound of range.
+        ubound (int): upper bound of range.
+        table (WheelTable): tables of the wheel.
+        bucket_rows (int, optional): rows per bucket, usually the rows of a segment.
+            Defaults to None, striking all primes one column at a time.
+    """
+
+    bucket_hits = BUCKET_HITS
+
+    def sieve(self, ubound):
+        """Sieve the next segment [prev, ubound), where prev is the upper bound of the previous
+        segment, or lbound for the first segment.
+
+        Args:
+            ubound (int): upper bound of segment.
+
+        Returns:
+            np.array: np.uint64 array of shape (len(k_list), words), bits set for primes.
+        """
+        lbound = self.prev
+        wheel = self.wheel
+        k_list = self.k_list
+        am = lbound // wheel
+        bm = (ubound - 2) // wheel + 1
+        base = am - am % WORD_BITS
+        words = (bm - base - 1) // WORD_BITS + 1
+        pre_bits = _presieve_bits(self.table)
+        period = pre_bits.shape[1] // 2
+        c_array = byte.tile_pattern(pre_bits, base // WORD_BITS % period, words, axis=1)
+        # Ignore numbers outside of range [lbound, ubound)
+        for i, k in enumerate(k_list):
+            lo = am if am * wheel + k >= lbound and am * wheel + k != 1 else am + 1
+            hi = bm if (bm - 1) * wheel + k < ubound else bm - 1
+            _clear_bits(c_array[i], 0, lo - base)
+            _clear_bits(c_array[i], hi - base, words * WORD_BITS)
+        # Sieve
+        prime_num = np.searchsorted(self.primes, int(np.sqrt(ubound)) + 1)
+        small_num = np.searchsorted(self.primes[:prime_num], WORD_BITS)
+        next_row = self.next_row[:prime_num] - base
+        for prime, phase_list in zip(
+            self.primes[:small_num].tolist(),
+            (next_row[:small_num] % self.primes[:small_num, None]).tolist(),
+        ):
+            pattern = _word_pattern(prime)
+            for idx, phase in enumerate(phase_list):
+                c_array[idx] &= np.resize(pattern[phase], words)
+        # Strike the remaining primes on bytes. Since prime is odd, the row offsets of prime * t
+        # repeat every 8 multiples, so each of the 8 residue classes of t is a strided slice
+        # with a constant mask.
+        c_bytes = c_array.view(np.uint8)
+        n_bytes = c_bytes.shape[1]
+        next_row = next_row[small_num:]
+        active = np.nonzero(next_row.min(axis=1) < bm - base)[0]
+        primes = self.primes[small_num:][active]
+        rows = next_row[active][:, :, None] + primes[:, None, None] * np.arange(8)
+        starts = rows // 8
+        masks = (~(1 << (rows % 8))).astype(np.uint8)
+        slice_num = np.searchsorted(primes, n_bytes // SLICE_HITS)
+        for prime, start_list, mask_list in zip(
+            primes[:slice_num].tolist(),
+            starts[:slice_num].tolist(),
+            masks[:slice_num].tolist(),
+        ):
+            for idx, (starts8, masks8) in enumerate(zip(start_list, mask_list)):
+                column = c_bytes[idx]
+                for start, mask in zip(starts8, masks8):
+                    column[start::prime] &= mask
+        # Larger primes only hit a few bytes per slice. A residue class is a column of the
+        # (rows, prime) view of the bytes, so all columns of the wheel are struck at once.
+        # All bytes of the residue class are struck, including those before start, which are
+        # multiples of prime as well.
+        columns = np.broadcast_to(np.arange(len(k_list))[:, None], (len(k_list), 8))
+        offsets_list = starts[slice_num:] % primes[slice_num:, None, None]
+        for prime, offsets, masks8 in zip(
+            primes[slice_num:].tolist(), offsets_list, masks[slice_num:]
+        ):
+            q = n_bytes // prime
+            view = c_bytes[:, : q * prime].reshape(len(k_list), q, prime)
+            view[columns, :, offsets] &= masks8[:, :, None]
+            tail = offsets < n_bytes - q * prime
+            c_bytes[columns[tail], q * prime + offsets[tail]] &= masks8[tail]
+        # Bucket sieved primes. Several multiples may be in the same byte, so they are struck
+        # one bit position at a time, where repeated bytes get the same mask.
+        rows, columns = self._bucket_hits(ubound)
+        rows -= base
+        flat = columns * n_bytes + rows // 8
+        bit = rows % 8
+        c_flat = c_bytes.reshape(-1)
+        for b in range(8):
+            c_flat[flat[bit == b]] &= np.uint8(~(1 << b) & 0xFF)
+        # Sieving primes themselves are struck by the patterns and residue classes.
+        lo, hi = np.searchsorted(self.primes, [lbound, ubound])
+        primes = np.array(
+            [prime for prime in self.pre_primes if lbound <= prime < ubound]
+            + self.primes[lo:hi].tolist(),
+            dtype=np.int64,
+        )
+        rows = primes // wheel - base
+        np.bitwise_or.at(
+            c_array,
+            (self.table.k_index[primes % wheel], rows // WORD_BITS),
+            np.left_shift(np.uint64(1), (rows % WORD_BITS).astype(np.uint64)),
+        )
+        self._advance(ubound)
+        return c_array
+
+
+def popcount(words):
+    """Count the set bits in an array of np.uint64 words.
+
+    Args:
+        words (np.array): np.uint64 array.
+
+    Returns:
+        int: number of set bits.
+    """
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(words).sum())
+    # SWAR popcount, 64 bits at a time.
+    words = words - ((words >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    words = (words & np.uint64(0x3333333333333333)) + (
+        (words >> np.uint64(2)) & np.uint64(0x3333333333333333)
+    )
+    words = (words + (words >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return int(((words * np.uint64(0x0101010101010101)) >> np.uint64(56)).sum())
+
+
+# prime -> np.uint64 array of shape (prime, prime).
+# Row phase is the complement of the bits of rows r == phase (mod prime), for one period of
+# prime words.
+_WORD_PATTERN = dict()
+
+
+def _word_pattern(prime):
+    if prime not in _WORD_PATTERN:
+        rows = np.arange(prime * WORD_BITS)
+        bits = rows[None, :] % prime != np.arange(prime)[:, None]
+        _WORD_PATTERN[prime] = (
+            np.packbits(bits, axis=1, bitorder="little").view("<u8").copy()
+        )
+    return _WORD_PATTERN[prime]
+
+
+# wheel -> np.uint64 array of shape (len(k_list), 2 * period).
+# Presieve pattern in the bit layout, with two periods of words per column.
+_PRESIEVE_BITS = dict()
+
+
+def _presieve_bits(table):
+    key = table.wheel
+    if key not in _PRESIEVE_BITS:
+        _pre_primes, pattern = byte.presieve(table)
+        period = len(pattern) // 2
+        rows = np.arange(2 * period * WORD_BITS) % period
+        bits = np.packbits(pattern[rows].T.copy(), axis=1, bitorder="little")
+        _PRESIEVE_BITS[key] = bits.view("<u8")
+    return _PRESIEVE_BITS[key]
+
+
+def _clear_bits(column, lo, hi):
+    # Clear bits [lo, hi) of a column of np.uint64 words.
+    if lo >= hi:
+        return
+    lq, lr = divmod(lo, WORD_BITS)
+    hq, hr = divmod(hi, WORD_BITS)
+    if lq == hq:
+        column[lq] &= ~np.uint64(((1 << hr) - 1) ^ ((1 << lr) - 1))
+        return
+    column[lq] &= np.uint64((1 << lr) - 1)
+    column[lq + 1 : hq] = 0
+    if hr != 0:
+        column[hq] &= ~np.uint64((1 << hr) - 1)
 
 
 if __name__ == "__main__":
-    print(wheel_sieve_count(1, 1_000_000_000))
+    for n in (1_000_000_000, 10_000_000_000):
+        for name, func, mem in (
+            ("byte", byte.wheel_sieve_count, byte.MEM),
+            ("bit", wheel_sieve_count, MEM),
+        ):
+            st = time.time()
+            res = func(1, n)
+            print(
+                "{:>4} {:.0e}: {} primes, {:.2f}s, {} bytes".format(
+                    name, n, res, time.time() - st, mem
+                )
+            )
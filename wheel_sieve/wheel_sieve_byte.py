@@ -1,20 +1,60 @@
 """Prime sieve with wheel factorization.
 """
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from threading import RLock
+import os
+import struct
+import tempfile
 import numpy as np
 
 # Memory (bytes) used in sieving numpy array
 MEM = 8_000_000
 
+# Memory (bytes) of one period of the presieve pattern
+PRESIEVE_MEM = 1_000_000
+
+# Primes hitting a bucket fewer than BUCKET_HITS times per column are bucket sieved.
+BUCKET_HITS = 16
+
+# Prime table file of PRIME_GEN, enabled by environment variable WHEEL_SIEVE_PRIMES.
+# Header (magic, version, bytes per prime, lim, number of primes), then the primes as a raw
+# little-endian array, so that the file can be memory-mapped.
+PRIME_FILE_MAGIC = b"WSPRIMES"
+PRIME_FILE_VERSION = 1
+PRIME_FILE_HEADER = struct.Struct("<8sIIQQ")
+
 
 class Worker(object):
-    """Prime generating worker. Keeps a list of generated primes.
+    """Prime generating worker. Keeps the generated primes in a growable np.uint32 array,
+    promoted to np.uint64 when needed. Safe to share between threads.
+
+    With a path, primes are memory-mapped from the prime table file when it has more of
+    them, and the file is extended whenever the worker generates beyond it.
+
+    Args:
+        ubound (int, optional): upper bound. Defaults to None.
+        path (str, optional): path of the prime table file. Defaults to None.
     """
 
-    def __init__(self, ubound=None):
+    def __init__(self, ubound=None, path=None):
         super(Worker, self).__init__()
         self.ubound = ubound
-        self.primes = [2, 3, 5]
+        self.path = path
         self.lim = 6
+        self.size = 3
+        self._buffer = np.array([2, 3, 5], dtype=np.uint32)
+        self._lock = RLock()
+        self._file_lim = 0
+        self._depth = 0
+
+    @property
+    def primes(self):
+        """np.array: primes generated so far, in ascending order. It is a view of the
+        generated primes, and must not be modified.
+        """
+        with self._lock:
+            return self._buffer[: self.size]
 
     def set_n(self, ubound):
         """Set upper bound for worker. Worker will not generate primes >= upper bound.
@@ -22,20 +62,141 @@ class Worker(object):
         Args:
             ubound (int): upper bound.
         """
-        if self.ubound is None or ubound > self.ubound:
-            self.ubound = ubound
+        with self._lock:
+            if self.ubound is None or ubound > self.ubound:
+                self.ubound = ubound
 
     def gen(self):
         """Generate next batch of primes.
         """
-        prime_tail = self.primes[-1]
-        new_lim = prime_tail * prime_tail - 1
-        if self.ubound is not None:
-            new_lim = min(new_lim, self.ubound + 1)
-        if new_lim > self.lim:
-            for prime in wheel_sieve(self.lim, new_lim):
-                self.primes.append(prime)
-            self.lim = new_lim
+        with self._lock:
+            prime_tail = int(self._buffer[self.size - 1])
+            new_lim = prime_tail * prime_tail - 1
+            if self.ubound is not None:
+                new_lim = min(new_lim, self.ubound + 1)
+            if new_lim > self.lim:
+                self._append(wheel_sieve_array(self.lim, new_lim))
+                self.lim = new_lim
+
+    def primes_below(self, n):
+        """Primes in [1, n), generating them if needed.
+
+        Args:
+            n (int): upper bound.
+
+        Returns:
+            np.array: primes in ascending order, of dtype np.uint32 or np.uint64. It is a view
+            of the generated primes, and must not be modified.
+        """
+        with self._lock:
+            self.set_n(n)
+            if self.lim < n and self.path is not None:
+                self.load(self.path)
+            # gen may call back into primes_below, so the file is only saved by the
+            # outermost call.
+            self._depth += 1
+            try:
+                while self.lim < n:
+                    self.gen()
+            finally:
+                self._depth -= 1
+            if (
+                self._depth == 0
+                and self.path is not None
+                and self.lim > self._file_lim
+            ):
+                try:
+                    self.save(self.path)
+                except OSError:
+                    # The file is only a cache.
+                    self._file_lim = self.lim
+            primes = self._buffer[: self.size]
+        return primes[: np.searchsorted(primes, n)]
+
+    def prime_pi(self, n):
+        """Number of primes <= n, generating them if needed.
+
+        Args:
+            n (int): upper bound, inclusive.
+
+        Returns:
+            int: number of primes.
+        """
+        return len(self.primes_below(n + 1))
+
+    def load(self, path):
+        """Memory-map the primes of a prime table file, if it has more of them than the
+        worker. Files that are missing, truncated or of another version are ignored.
+
+        Args:
+            path (str): path of the prime table file.
+
+        Returns:
+            bool: True if the primes are loaded.
+        """
+        try:
+            with open(path, "rb") as f:
+                header = f.read(PRIME_FILE_HEADER.size)
+                file_size = os.fstat(f.fileno()).st_size
+        except OSError:
+            return False
+        if len(header) != PRIME_FILE_HEADER.size:
+            return False
+        magic, version, itemsize, lim, size = PRIME_FILE_HEADER.unpack(header)
+        if (
+            magic != PRIME_FILE_MAGIC
+            or version != PRIME_FILE_VERSION
+            or itemsize not in (4, 8)
+            or file_size != PRIME_FILE_HEADER.size + itemsize * size
+            or size < 3
+        ):
+            return False
+        with self._lock:
+            self._file_lim = max(self._file_lim, lim)
+            if lim <= self.lim:
+                return False
+            self._buffer = np.memmap(
+                path,
+                dtype="<u{}".format(itemsize),
+                mode="r",
+                offset=PRIME_FILE_HEADER.size,
+                shape=(size,),
+            )
+            self.size = size
+            self.lim = lim
+        return True
+
+    def save(self, path):
+        """Write the generated primes to a prime table file. The file is replaced atomically,
+        so that other processes never map a partial file.
+
+        Args:
+            path (str): path of the prime table file.
+        """
+        with self._lock:
+            primes = self._buffer[: self.size]
+            primes = primes.astype(primes.dtype.newbyteorder("<"), copy=False)
+            header = PRIME_FILE_HEADER.pack(
+                PRIME_FILE_MAGIC,
+                PRIME_FILE_VERSION,
+                primes.dtype.itemsize,
+                self.lim,
+                self.size,
+            )
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(header)
+                    primes.tofile(f)
+                # Readable by other users, like a file created by open
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._file_lim = self.lim
 
     def __call__(self, ubound):
         """Returns a generator for primes in [1, ubound).
@@ -46,28 +207,40 @@ class Worker(object):
         Yields:
             int: primes in ascending order.
         """
-        self.set_n(ubound)
-        i = 0
-        while True:
-            if i >= len(self.primes):
-                self.gen()
-            if i >= len(self.primes) or self.primes[i] >= ubound:
-                break
-            else:
-                yield self.primes[i]
-                i += 1
+        yield from self.primes_below(ubound).tolist()
+
+    def _append(self, primes):
+        # Append primes to the buffer, doubling its capacity when full. Entries below size are
+        # never written again, so views returned by primes_below stay valid. A memory-mapped
+        # buffer is read-only and full, so it is copied on the first append.
+        if len(primes) == 0:
+            return
+        size = self.size + len(primes)
+        dtype = self._buffer.dtype
+        if int(primes[-1]) > np.iinfo(dtype).max:
+            dtype = np.dtype(np.uint64)
+        if size > len(self._buffer) or dtype != self._buffer.dtype:
+            buffer = np.empty(max(size, 2 * len(self._buffer)), dtype=dtype)
+            buffer[: self.size] = self._buffer[: self.size]
+            self._buffer = buffer
+        self._buffer[self.size : size] = primes
+        self.size = size
 
 
-PRIME_GEN = Worker()
+PRIME_GEN = Worker(path=os.environ.get("WHEEL_SIEVE_PRIMES"))
 
 
-def wheel_sieve_count(lbound, ubound, p_list=(2, 3, 5)):
+def wheel_sieve_count(lbound, ubound, p_list=(2, 3, 5), workers=None, mem=None):
     """Count primes in [lbound, ubound) using wheel sieve.
 
     Args:
         lbound (int): lower bound of range.
         ubound (int): upper bound of range.
         p_list (tuple, optional): wheel primes. Defaults to (2, 3, 5).
+        workers (int, optional): number of worker processes. Segments are sieved in a process
+            pool when workers > 1. Defaults to None, sieving in the current process.
+        mem (int, optional): memory (bytes) of the sieving array of a segment.
+            Defaults to None, using MEM.
 
     Raises:
         ValueError: Thrown when input is bad.
@@ -83,44 +256,45 @@ def wheel_sieve_count(lbound, ubound, p_list=(2, 3, 5)):
         raise ValueError
     if not all(isinstance(x, int) and x > 1 for x in p_list):
         raise ValueError
+    if mem is None:
+        mem = MEM
+    elif not isinstance(mem, int) or mem < 1:
+        raise ValueError
     PRIME_GEN.set_n(int(np.sqrt(ubound)) + 1)
-    # wheel : product of primes in p_list
-    # k_list : numbers from 1 to wheel coprime to wheel
-    # kl_list : multiplication table of k_list mod wheel
-    wheel = 1
-    for wheel_prime in p_list:
-        wheel *= wheel_prime
-    k_list = [
-        k
-        for k in range(1, wheel)
-        if all(k % wheel_prime != 0 for wheel_prime in p_list)
-    ]
-    kl_list = {k: [k_list.index(k * l % wheel) for l in k_list] for k in k_list}
+    table = wheel_table(p_list)
+    wheel, k_list = table.wheel, table.k_list
     # Count primes between lbound and max(p_list)
     count = 0
     if lbound <= max(p_list):
-        for wheel_prime in PRIME_GEN(max(p_list) + 1):
+        for wheel_prime in PRIME_GEN(min(max(p_list) + 1, ubound)):
             if lbound <= wheel_prime and wheel % wheel_prime == 0:
                 count += 1
     # Split into smaller partitions to reduce memory usage
-    step_size = max(1, MEM // len(k_list)) * wheel
-    prev = lbound
-    while prev < ubound:
-        curr = ((prev + step_size - 1) // wheel + 1) * wheel
-        curr = min(curr, ubound)
-        res = _wheel_sieve(prev, curr, wheel, k_list, kl_list)
-        count += np.count_nonzero(res)
-        prev = curr
-    return count
+    step_size = max(1, mem // len(k_list)) * wheel
+    segments = split_segments(lbound, ubound, step_size, wheel)
+    if workers is None or workers <= 1:
+        sieve = SegmentedSieve(lbound, ubound, table, step_size // wheel)
+        for _prev, curr in segments:
+            count += np.count_nonzero(sieve.sieve(curr))
+    else:
+        tasks = ((prev, curr, p_list) for prev, curr in segments)
+        for segment_count in _parallel_map(_count_segment, tasks, workers):
+            count += segment_count
+    return int(count)
 
 
-def wheel_sieve(lbound, ubound, p_list=(2, 3, 5)):
+def wheel_sieve(lbound, ubound, p_list=(2, 3, 5), workers=None, mem=None):
     """Generate primes in [lbound, ubound) using wheel sieve.
 
     Args:
         lbound (int): lower bound of range.
         ubound (int): upper bound of range.
         p_list (tuple, optional): wheel primes. Defaults to (2, 3, 5).
+        workers (int, optional): number of worker processes. Segments are sieved in a process
+            pool when workers > 1, and primes are still yielded in ascending order.
+            Defaults to None, sieving in the current process.
+        mem (int, optional): memory (bytes) of the sieving array of a segment.
+            Defaults to None, using MEM.
 
     Raises:
         ValueError: Thrown when input is bad.
@@ -128,6 +302,53 @@ def wheel_sieve(lbound, ubound, p_list=(2, 3, 5)):
     Yields:
         int: primes in ascending order.
     """
+    for primes in wheel_sieve_segments(lbound, ubound, p_list, workers, mem):
+        yield from primes.tolist()
+
+
+def wheel_sieve_array(lbound, ubound, p_list=(2, 3, 5), workers=None, mem=None):
+    """Compute primes in [lbound, ubound) using wheel sieve.
+
+    Args:
+        lbound (int): lower bound of range.
+        ubound (int): upper bound of range.
+        p_list (tuple, optional): wheel primes. Defaults to (2, 3, 5).
+        workers (int, optional): number of worker processes. Segments are sieved in a process
+            pool when workers > 1. Defaults to None, sieving in the current process.
+        mem (int, optional): memory (bytes) of the sieving array of a segment.
+            Defaults to None, using MEM.
+
+    Raises:
+        ValueError: Thrown when input is bad.
+
+    Returns:
+        np.array: primes in ascending order, of dtype np.uint64.
+    """
+    return np.concatenate(
+        [np.zeros(0, dtype=np.uint64)]
+        + list(wheel_sieve_segments(lbound, ubound, p_list, workers, mem))
+    )
+
+
+def wheel_sieve_segments(lbound, ubound, p_list=(2, 3, 5), workers=None, mem=None):
+    """Generate primes in [lbound, ubound) using wheel sieve, one array per segment.
+
+    Args:
+        lbound (int): lower bound of range.
+        ubound (int): upper bound of range.
+        p_list (tuple, optional): wheel primes. Defaults to (2, 3, 5).
+        workers (int, optional): number of worker processes. Segments are sieved in a process
+            pool when workers > 1, and arrays are still yielded in ascending order.
+            Defaults to None, sieving in the current process.
+        mem (int, optional): memory (bytes) of the sieving array of a segment.
+            Defaults to None, using MEM.
+
+    Raises:
+        ValueError: Thrown when input is bad.
+
+    Yields:
+        np.array: primes of each segment in ascending order, of dtype np.uint64.
+    """
     if (
         not isinstance(lbound, int)
         or not isinstance(ubound, int)
@@ -136,58 +357,386 @@ def wheel_sieve(lbound, ubound, p_list=(2, 3, 5)):
         raise ValueError
     if not all(isinstance(x, int) and x > 1 for x in p_list):
         raise ValueError
+    if mem is None:
+        mem = MEM
+    elif not isinstance(mem, int) or mem < 1:
+        raise ValueError
     PRIME_GEN.set_n(int(np.sqrt(ubound)) + 1)
-    # wheel : product of primes in p_list
-    # k_list : numbers from 1 to wheel coprime to wheel
-    # kl_list : multiplication table of k_list mod wheel
-    wheel = 1
-    for wheel_prime in p_list:
-        wheel *= wheel_prime
-    k_list = [
-        k
-        for k in range(1, wheel)
-        if all(k % wheel_prime != 0 for wheel_prime in p_list)
-    ]
-    kl_list = {k: [k_list.index(k * l % wheel) for l in k_list] for k in k_list}
-    # Yield primes between lbound and max(p_list)
+    table = wheel_table(p_list)
+    wheel, k_list = table.wheel, table.k_list
+    # Primes between lbound and max(p_list)
     if lbound <= max(p_list):
-        for prime in PRIME_GEN(max(p_list) + 1):
-            if lbound <= prime and wheel % prime == 0:
-                yield prime
+        yield np.array(
+            [
+                prime
+                for prime in PRIME_GEN(min(max(p_list) + 1, ubound))
+                if lbound <= prime and wheel % prime == 0
+            ],
+            dtype=np.uint64,
+        )
     # Split into smaller partitions to reduce memory usage
-    step_size = max(1, MEM // len(k_list)) * wheel
+    step_size = max(1, mem // len(k_list)) * wheel
+    segments = split_segments(lbound, ubound, step_size, wheel)
+    if workers is None or workers <= 1:
+        sieve = SegmentedSieve(lbound, ubound, table, step_size // wheel)
+        for prev, curr in segments:
+            yield _primes(sieve.sieve(curr), prev, table)
+    else:
+        tasks = ((prev, curr, p_list) for prev, curr in segments)
+        yield from _parallel_map(_primes_segment, tasks, workers)
+
+
+class SegmentedSieve(object):
+    """Stateful segmented wheel sieve on [lbound, ubound).
+
+    Numbers are arranged in rows of the wheel: number m * wheel + k_list[i] is at row m,
+    column i. For every sieving prime and every column, the row of the next multiple to be
+    struck is kept in an array and advanced from one segment to the next, so sieving a
+    segment only costs the strikes. The smallest primes beyond the wheel are never struck:
+    each segment starts as a copy of their periodic pattern.
+
+    Primes that hit a bucket of bucket_rows rows fewer than bucket_hits times per column are
+    bucket sieved instead: their next multiples are filed into buckets by row, and a
+    segment only handles the multiples in its buckets, all at once.
+
+    Args:
+        lbound (int): lower bound of range.
+        ubound (int): upper bound of range.
+        table (WheelTable): tables of the wheel.
+        bucket_rows (int, optional): rows per bucket, usually the rows of a segment.
+            Defaults to None, striking all primes one column at a time.
+    """
+
+    bucket_hits = BUCKET_HITS
+
+    def __init__(self, lbound, ubound, table, bucket_rows=None):
+        super(SegmentedSieve, self).__init__()
+        self.prev = lbound
+        self.ubound = ubound
+        self.table = table
+        self.wheel = wheel = table.wheel
+        self.k_list = k_list = table.k_list
+        self.pre_primes, self.pattern = presieve(table)
+        primes = PRIME_GEN.primes_below(int(np.sqrt(ubound)) + 1).astype(np.int64)
+        self.primes = primes[(wheel % primes != 0) & ~np.isin(primes, self.pre_primes)]
+        # Bucket sieved primes: bucket -> list of (rows, columns, primes) arrays
+        self.bucket_rows = bucket_rows
+        self.buckets = dict()
+        if bucket_rows is not None:
+            bucket_num = np.searchsorted(
+                self.primes, max(1, bucket_rows // self.bucket_hits)
+            )
+            large = self.primes[bucket_num:]
+            self.primes = self.primes[:bucket_num]
+            next_row = _first_rows(large, lbound // wheel, table)
+            self._file(
+                next_row.ravel(),
+                np.tile(np.arange(len(k_list)), len(large)),
+                np.repeat(large, len(k_list)),
+            )
+        self.next_row = _first_rows(self.primes, lbound // wheel, table)
+
+    def sieve(self, ubound):
+        """Sieve the next segment [prev, ubound), where prev is the upper bound of the previous
+        segment, or lbound for the first segment.
+
+        Args:
+            ubound (int): upper bound of segment.
+
+        Returns:
+            np.array: bool array of shape (rows, len(k_list)), True for primes. Entry [km, i]
+            is for number (prev // wheel + km) * wheel + k_list[i].
+        """
+        lbound = self.prev
+        wheel = self.wheel
+        k_list = self.k_list
+        # Ignore numbers outside of range [lbound, ubound)
+        am = lbound // wheel
+        bm = (ubound - 2) // wheel + 1
+        period = len(self.pattern) // 2
+        c_array = tile_pattern(self.pattern, am % period, bm - am)
+        if bm > am:
+            first = am * wheel + self.table.k_array
+            c_array[0, (first < lbound) | (first == 1)] = False
+            c_array[-1, (bm - 1) * wheel + self.table.k_array >= ubound] = False
+        # Sieve
+        prime_num = np.searchsorted(self.primes, int(np.sqrt(ubound)) + 1)
+        next_row = self.next_row[:prime_num]
+        active = np.nonzero(next_row.min(axis=1) < bm)[0]
+        for prime, nm_list in zip(
+            self.primes[active].tolist(), (next_row[active] - am).tolist()
+        ):
+            for idx, nm in enumerate(nm_list):
+                c_array[nm::prime, idx] = False
+        rows, columns = self._bucket_hits(ubound)
+        c_array[rows - am, columns] = False
+        # Presieve primes themselves are struck by the pattern.
+        for prime in self.pre_primes:
+            if lbound <= prime < ubound:
+                c_array[prime // wheel - am, self.table.k_index[prime % wheel]] = True
+        self._advance(ubound)
+        return c_array
+
+    def _advance(self, ubound):
+        # Advance to the first row of the next segment. The last row is shared with the next
+        # segment when ubound is not a multiple of wheel.
+        cm = ubound // self.wheel
+        primes = self.primes[:, None]
+        skip = np.maximum(cm - self.next_row, 0)
+        self.next_row += (skip + primes - 1) // primes * primes
+        self.prev = ubound
+
+    def _bucket_hits(self, ubound):
+        # Rows and columns of the multiples of bucket sieved primes in segment [prev, ubound).
+        # They are filed again from the first row of the next segment, as in _advance.
+        bm = (ubound - 2) // self.wheel + 1
+        cm = ubound // self.wheel
+        due = [
+            bucket for bucket in sorted(self.buckets) if bucket * self.bucket_rows < bm
+        ]
+        parts = [part for bucket in due for part in self.buckets.pop(bucket)]
+        rows, columns, primes = (
+            np.concatenate([np.zeros(0, dtype=np.int64)] + [part[i] for part in parts])
+            for i in range(3)
+        )
+        rows_list, columns_list = [], []
+        while len(rows) > 0:
+            hit = rows < bm
+            rows_list.append(rows[hit])
+            columns_list.append(columns[hit])
+            done = rows >= cm
+            self._file(rows[done], columns[done], primes[done])
+            rows, columns, primes = rows[~done], columns[~done], primes[~done]
+            rows = rows + primes
+        return (
+            np.concatenate([np.zeros(0, dtype=np.int64)] + rows_list),
+            np.concatenate([np.zeros(0, dtype=np.int64)] + columns_list),
+        )
+
+    def _file(self, rows, columns, primes):
+        # File multiples into buckets by row.
+        if len(rows) == 0:
+            return
+        buckets = rows // self.bucket_rows
+        order = np.argsort(buckets, kind="stable")
+        buckets = buckets[order]
+        starts = np.nonzero(np.diff(buckets))[0] + 1
+        for bucket, idx in zip(
+            buckets[np.r_[0, starts]].tolist(), np.split(order, starts)
+        ):
+            self.buckets.setdefault(bucket, []).append(
+                (rows[idx], columns[idx], primes[idx])
+            )
+
+
+def _first_rows(primes, am, table):
+    # Multiples prime * (km * wheel + k) with k in k_list are in row
+    # prime * km + prime * k // wheel, column index of (prime * k % wheel) in k_list.
+    wheel = table.wheel
+    k_array = table.k_array
+    columns = table.k_index[(primes % wheel)[:, None] * k_array % wheel]
+    primes = primes[:, None]
+    km = np.maximum(primes // wheel, am // primes)
+    nm = primes * km + primes * k_array // wheel
+    nm += np.where((nm < am) | ((km == 0) & (k_array == 1)), primes, 0)
+    next_row = np.empty_like(nm)
+    np.put_along_axis(next_row, columns, nm, axis=1)
+    return next_row
+
+
+def split_segments(lbound, ubound, step_size, wheel):
+    """Split [lbound, ubound) into segments of about step_size, ending on multiples of wheel.
+
+    Args:
+        lbound (int): lower bound of range.
+        ubound (int): upper bound of range.
+        step_size (int): size of a segment.
+        wheel (int): segments other than the last end on multiples of wheel.
+
+    Yields:
+        tuple(int, int): (lower bound, upper bound) of each segment, in ascending order.
+    """
     prev = lbound
     while prev < ubound:
-        curr = prev + step_size
+        curr = ((prev + step_size - 1) // wheel + 1) * wheel
         curr = min(curr, ubound)
-        res = _wheel_sieve(prev, curr, wheel, k_list, kl_list)
-        for km, k in zip(*np.where(res)):
-            yield int((prev // wheel + km) * wheel + k_list[k])
+        yield prev, curr
         prev = curr
 
 
-def _wheel_sieve(lbound, ubound, wheel, k_list, kl_list):
-    # Ignore numbers outside of range [lbound, ubound)
-    am = lbound // wheel
-    bm = (ubound - 2) // wheel + 1
-    c_array = np.ones((bm - am, len(k_list)), dtype=np.bool)
-    for i, k in enumerate(k_list):
-        if am * wheel + k < lbound or am * wheel + k == 1:
-            c_array[0, i] = False
-        if (bm - 1) * wheel + k >= ubound:
-            c_array[-1, i] = False
-    # Sieve
-    for prime in PRIME_GEN(int(np.sqrt(ubound)) + 1):
-        if wheel % prime == 0:
-            continue
-        km = max(prime // wheel, am // prime)
-        kp_list = kl_list[prime % wheel]
-        for k, idx in zip(k_list, kp_list):
-            nm = prime * km + prime * k // wheel - am
-            if nm < 0 or (km == 0 and k == 1):
-                nm += prime
-            c_array[nm::prime, idx] = False
-    return c_array
+class WheelTable(object):
+    """Tables of a wheel, built once per p_list by wheel_table.
+
+    Args:
+        p_list (tuple): wheel primes.
+
+    Attributes:
+        p_list (tuple): wheel primes.
+        wheel (int): product of wheel primes.
+        k_list (list(int)): numbers from 1 to wheel coprime to wheel.
+        k_array (np.array): k_list as np.int64 array.
+        k_index (np.array): np.int64 array of size wheel, index of k in k_list, or -1 when k is
+            not coprime to wheel.
+    """
+
+    def __init__(self, p_list):
+        super(WheelTable, self).__init__()
+        self.p_list = tuple(p_list)
+        self.wheel = 1
+        for wheel_prime in self.p_list:
+            self.wheel *= wheel_prime
+        coprime = np.ones(self.wheel, dtype=bool)
+        for wheel_prime in self.p_list:
+            coprime[::wheel_prime] = False
+        self.k_array = np.nonzero(coprime)[0].astype(np.int64)
+        self.k_list = self.k_array.tolist()
+        self.k_index = np.full(self.wheel, -1, dtype=np.int64)
+        self.k_index[self.k_array] = np.arange(len(self.k_list))
+
+
+# p_list -> WheelTable
+_WHEEL_TABLES = dict()
+
+
+def wheel_table(p_list):
+    """Tables of the wheel of p_list, shared across calls and sieve modules.
+
+    Args:
+        p_list (tuple): wheel primes.
+
+    Returns:
+        WheelTable: tables of the wheel.
+    """
+    p_list = tuple(p_list)
+    if p_list not in _WHEEL_TABLES:
+        _WHEEL_TABLES[p_list] = WheelTable(p_list)
+    return _WHEEL_TABLES[p_list]
+
+
+# wheel -> (presieve primes, pattern).
+_PRESIEVE = dict()
+
+
+def presieve(table):
+    """Presieve pattern of a wheel, shared across calls and sieve modules. The presieve
+    primes are the smallest primes coprime to wheel, as many as fit their pattern in
+    PRESIEVE_MEM.
+
+    Entry [r, i] of the pattern is False when r * wheel + k_list[i] is a multiple of one of
+    them. It is periodic in r with the product of the primes as period, and two periods are
+    kept so that any phase can be copied at once with tile_pattern.
+
+    Args:
+        table (WheelTable): tables of the wheel.
+
+    Returns:
+        tuple(list(int), np.array): (presieve primes, bool pattern of shape
+        (2 * period, len(k_list))).
+    """
+    wheel = table.wheel
+    if wheel not in _PRESIEVE:
+        pre_primes = []
+        period = 1
+        n = 1
+        while True:
+            n += 1
+            if wheel % n == 0 or any(n % d == 0 for d in range(2, int(n ** 0.5) + 1)):
+                continue
+            if period * n * len(table.k_list) > PRESIEVE_MEM:
+                break
+            pre_primes.append(n)
+            period *= n
+        numbers = np.arange(2 * period, dtype=np.int64)[:, None] * wheel + table.k_array
+        pattern = np.ones(numbers.shape, dtype=bool)
+        for prime in pre_primes:
+            pattern &= numbers % prime != 0
+        _PRESIEVE[wheel] = pre_primes, pattern
+    return _PRESIEVE[wheel]
+
+
+def tile_pattern(doubled, offset, n, axis=0):
+    """Tile a periodic pattern, given as two periods along axis, to length n starting from
+    offset. The first period is copied from the pattern, then the result copies itself.
+
+    Args:
+        doubled (np.array): two periods of the pattern along axis.
+        offset (int): phase of the first entry, below the period.
+        n (int): length of the result along axis.
+        axis (int, optional): axis of the period. Defaults to 0.
+
+    Returns:
+        np.array: tiled pattern, a new array.
+    """
+    period = doubled.shape[axis] // 2
+    shape = list(doubled.shape)
+    shape[axis] = n
+    tiled = np.empty(shape, dtype=doubled.dtype)
+    src = np.moveaxis(doubled, axis, 0)
+    dst = np.moveaxis(tiled, axis, 0)
+    filled = min(n, period)
+    dst[:filled] = src[offset : offset + filled]
+    while filled < n:
+        size = min(filled, n - filled)
+        dst[filled : filled + size] = dst[:size]
+        filled += size
+    return tiled
+
+
+def _worker_table(ubound, p_list):
+    PRIME_GEN.set_n(int(np.sqrt(ubound)) + 1)
+    return wheel_table(p_list)
+
+
+def _count_segment(lbound, ubound, p_list):
+    table = _worker_table(ubound, p_list)
+    return int(np.count_nonzero(_wheel_sieve(lbound, ubound, table)))
+
+
+def _primes_segment(lbound, ubound, p_list):
+    table = _worker_table(ubound, p_list)
+    return _primes(_wheel_sieve(lbound, ubound, table), lbound, table)
+
+
+def _primes(c_array, lbound, table):
+    # Numbers of the True entries of a sieved segment, in ascending order.
+    km, k = np.nonzero(c_array)
+    primes = km.astype(np.uint64)
+    primes += lbound // table.wheel
+    primes *= table.wheel
+    primes += table.k_array[k].astype(np.uint64)
+    return primes
+
+
+def _parallel_map(func, tasks, workers):
+    """Apply func to each task in a process pool and yield the results in order.
+    At most 2 * workers tasks are in flight, so results are not buffered without bound when
+    the consumer is slow.
+
+    Args:
+        func (function): Module level function to be applied.
+        tasks (iterable(tuple)): Positional arguments of each call.
+        workers (int): Number of worker processes.
+
+    Yields:
+        object: Return value of each call, in the order of tasks.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        try:
+            for task in tasks:
+                pending.append(executor.submit(func, *task))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _wheel_sieve(lbound, ubound, table):
+    bucket_rows = (ubound - lbound) // table.wheel + 1
+    return SegmentedSieve(lbound, ubound, table, bucket_rows).sieve(ubound)
 
 
 if __name__ == "__main__":